@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# === Cache LRU/TTL des réponses résolues ===
+# Clé : (version du corpus, langue, question nettoyée). On ne stocke que la décision
+# (type + identifiants), jamais les effets de bord de session.
+# La version est incrémentée à chaque modification de Category/Response,
+# ce qui invalide d'un coup toutes les entrées existantes.
+
+ANSWER_CACHE_SIZE = int(os.environ.get("CHATBOT_ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_TTL = float(os.environ.get("CHATBOT_ANSWER_CACHE_TTL", 600))
+
+
+class AnswerCache:
+    def __init__(self, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, lang, question_clean):
+        return self.version, lang, question_clean
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            # ⏭️ Décision calculée sur une ancienne version du corpus : inutile de la garder
+            if key[0] != self.version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
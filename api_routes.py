@@ -1,8 +1,10 @@
-from flask import Blueprint, jsonify, request, session
-from langdetect import detect
-from models import db, Category, Response, Setting
-from text_api import ask_question, model_intent, intent_embeddings, intent_tags  # ← ajout intelligent
-from sentence_transformers import util
+from flask import Blueprint, jsonify, request, session, current_app, abort
+import os
+from models import Setting
+from navigation import category_nodes, get_snapshot, nav_lang
+from config_cache import config_version
+from lang_id import identify_lang
+from text_api import ask_question, prepare_query, embed_query, intent_index, intent_tags, answer_cache  # ← ajout intelligent
 
 api_bp = Blueprint('api', __name__)
 
@@ -17,16 +19,22 @@ def chatbot_init():
         "clarification_required": False
     })
 
-# 🔹 Fallback personnalisé
-def guess_lang_fallback(text):
-    text = text.lower()
-    if any(w in text for w in ["bonjour", "salut", "merci", "svp", "aide"]):
-        return "fr"
-    elif any(w in text for w in ["hello", "please", "help", "thanks"]):
-        return "en"
-    elif any(c in text for c in ["أ", "إ", "ل", "ب", "ك", "ى", "ة", "؟"]):
-        return "ar"
-    return None
+# 🔹 Route : État du préchargement des embeddings
+@api_bp.route('/api/health/ready')
+def health_ready():
+    from preload_utils import warmup_progress
+    progress = warmup_progress()
+    return jsonify(progress), 200 if progress["ready"] else 503
+
+# 🔹 Route : Statistiques du cache des réponses
+@api_bp.route('/api/health/cache')
+def health_cache():
+    return jsonify(answer_cache.stats())
+
+# 🔹 Route : Versions de la configuration en mémoire (paramètres, fichiers de traduction)
+@api_bp.route('/api/health/config')
+def health_config():
+    return jsonify(config_version())
 
 # 🔹 Route : Démarrage après message utilisateur
 @api_bp.route('/api/start', methods=['POST'])
@@ -34,39 +42,27 @@ def chatbot_start():
     data = request.get_json()
     user_message = data.get("message", "").strip()
 
-    try:
-        detected_lang = detect(user_message)
-    except:
-        detected_lang = None
-
-    lang = detected_lang if detected_lang in ['fr', 'en', 'ar'] else guess_lang_fallback(user_message)
-    if lang is None:
-        lang = get_chatbot_language()
+    # Message vide ou sans lettres : langue configurée du chatbot
+    lang = identify_lang(user_message, default=None) or get_chatbot_language()
 
     has_started = session.get("chat_started", False)
 
+    # ✅ Question préparée une seule fois (encodage à la demande), partagée avec ask_question
+    query = prepare_query(user_message) if user_message else None
+
     # ✅ Remplacement par détection d’intention intelligente
-    if not has_started:
+    if not has_started and query:
         from torch import no_grad
         with no_grad():
-            q_embed = model_intent.encode(user_message, convert_to_tensor=True)
-            scores = util.cos_sim(q_embed, intent_embeddings)[0]
-            best_score = float(scores.max())
-            best_idx = int(scores.argmax())
+            q_embed, _ = embed_query(query)
+            scores, indices = intent_index.search(q_embed, 1)
+            best_score = float(scores[0])
+            best_idx = int(indices[0])
             best_tag = intent_tags[best_idx]
 
             if best_score > 0.6 and best_tag == "greeting":
                 session["chat_started"] = True
-                categories = Category.query.filter_by(parent_id=None, visible=True).all()
-                cat_list = [
-                    {
-                        "id": cat.id,
-                        "label": cat.get_translated_name(lang),
-                        "has_children": len([c for c in cat.subcategories if c.visible]) > 0,
-                        "response_count": len([r for r in cat.responses if r.visible])
-                    }
-                    for cat in categories
-                ]
+                cat_list = category_nodes(None, lang)
                 return jsonify({
                     "message": get_messages(lang)["select_prompt"],
                     "lang": lang,
@@ -76,7 +72,7 @@ def chatbot_start():
                 })
 
     # 🔁 Sinon : redirection vers la recherche textuelle
-    return ask_question(user_message)
+    return ask_question(user_message, query)
 
 # 🔸 Messages multilingues
 def get_messages(lang):
@@ -127,74 +123,55 @@ def get_navigation(stage):
 def get_chatbot_language():
     return Setting.get_value("CHATBOT_LANGUAGE", "fr")
 
+# 🔹 Réponse JSON servie depuis l'instantané de navigation (ETag fort + 304)
+NAV_MAX_AGE = int(os.environ.get("CHATBOT_NAV_MAX_AGE", 60))
+
+def navigation_response(key, build_payload):
+    snapshot = get_snapshot()
+    body = snapshot.body(key, lambda: current_app.json.dumps(build_payload(snapshot)) + "\n")
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(snapshot.etag(key))
+    response.cache_control.public = True
+    response.cache_control.max_age = NAV_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
 # 🔹 Route : Catégories principales
 @api_bp.route('/api/categories')
 def get_main_categories():
-    lang = request.args.get("lang", get_chatbot_language())
-    categories = Category.query.filter_by(parent_id=None, visible=True).all()
-    cat_list = [
-        {
-            "id": cat.id,
-            "label": cat.get_translated_name(lang),
-            "has_children": len([c for c in cat.subcategories if c.visible]) > 0,
-            "response_count": len(cat.responses)
-        }
-        for cat in categories
-    ]
-    return jsonify({
+    lang = nav_lang(request.args.get("lang") or get_chatbot_language())
+    return navigation_response(("categories", lang), lambda snapshot: {
         "messages": get_messages(lang),
         "navigation_options": get_navigation("categories"),
-        "categories": cat_list,
+        "categories": snapshot.category_nodes(None, lang),
         "clarification_required": False
     })
 
 # 🔹 Route : Sous-catégories
 @api_bp.route('/api/categories/<int:category_id>/subcategories')
 def get_subcategories(category_id):
-    lang = request.args.get("lang", get_chatbot_language())
-    subcats = Category.query.filter_by(parent_id=category_id, visible=True).all()
-    sub_list = [
-        {
-            "id": sub.id,
-            "label": sub.get_translated_name(lang),
-            "has_children": len([c for c in sub.subcategories if c.visible]) > 0,
-            "response_count": len(sub.responses)
-        }
-        for sub in subcats
-    ]
-    return jsonify({
+    lang = nav_lang(request.args.get("lang") or get_chatbot_language())
+    if category_id not in get_snapshot().category_ids:
+        abort(404)
+
+    return navigation_response(("subcategories", category_id, lang), lambda snapshot: {
         "messages": get_messages(lang),
         "navigation_options": get_navigation("subcategories"),
-        "subcategories": sub_list,
+        "subcategories": snapshot.category_nodes(category_id, lang),
         "clarification_required": False
     })
 
 # 🔹 Route : Réponses
 @api_bp.route('/api/categories/<int:category_id>/responses')
 def get_responses(category_id):
-    lang = request.args.get("lang", get_chatbot_language())
-    category = Category.query.get_or_404(category_id)
-    if not category.visible:
-        return jsonify({
-            "messages": get_messages(lang),
-            "navigation_options": get_navigation("responses"),
-            "responses": [],
-            "clarification_required": False
-        })
-
-    responses = Response.query.filter_by(category_id=category_id).all()
-    resp_list = [
-        {
-            "id": r.id,
-            "type": r.type,
-            "answer": getattr(r, f'answer_{lang}', r.answer_fr),
-            "file_url": r.file_url
-        }
-        for r in responses
-    ]
-    return jsonify({
+    lang = nav_lang(request.args.get("lang") or get_chatbot_language())
+    if category_id not in get_snapshot().category_ids:
+        abort(404)
+
+    # Catégorie masquée : liste vide (pas de réponses dans l'instantané)
+    return navigation_response(("responses", category_id, lang), lambda snapshot: {
         "messages": get_messages(lang),
         "navigation_options": get_navigation("responses"),
-        "responses": resp_list,
+        "responses": snapshot.category_responses(category_id, lang),
         "clarification_required": False
     })
@@ -1,17 +1,23 @@
 import json
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, stream_with_context
 from werkzeug.security import check_password_hash, generate_password_hash
-from models import db, Category, Response
+from models import db, Category, Response, Admin
 import requests
 import os
-from werkzeug.utils import secure_filename
-from translate_utils import translate_with_gemma as translate_text
-from langdetect import detect
-from flask import send_from_directory
+from translation_jobs import schedule_translation, cancel_jobs, placeholder_fields, job_statuses, start_translation_worker
+from content_io import start_import, import_runs, export_lines
+from category_tree import get_category_tree, get_flat_category_tree
+from content_stats import get_stats, rebuild_stats, init_stats
+from config_cache import translation_bundles
+from file_store import UPLOAD_DIR, UploadTooLarge, limit_upload_request, store_upload, send_stored_file, init_file_store, file_url as stored_file_url
+from file_processing import schedule_processing, start_file_worker
+from werkzeug.exceptions import RequestEntityTooLarge
+from audit_log import log_action, log_action_later, log_page, parse_log_filters, start_audit_writer, LOG_ACTIONS, LOG_TARGET_TYPES
+import tempfile
+from lang_id import identify_lang
 import json
 from flask import jsonify
 from datetime import datetime
-from models import db, Log
 from flask_cors import CORS
 
 from flask_cors import CORS
@@ -45,26 +51,24 @@ app.wsgi_app = PrefixMiddleware(app.wsgi_app, prefix='/chatbot')
 CORS(app)
 app.secret_key = 'supersecretkey'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
-app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# 🌍 Langue et chargement de traduction depuis fichier JSON
+# 🌍 Langue et chargement de traduction depuis fichier JSON (gardé en mémoire, relu si modifié)
 def load_translations(lang):
-    try:
-        with open(f'translations/{lang}.json', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {}
+    return translation_bundles.get(lang)
 
 @app.before_request
 def set_default_language():
     if 'lang' not in session:
         session['lang'] = 'fr'
-    g.translations = load_translations(session['lang'])
 
 @app.context_processor
 def inject_translation_function():
     def t(key):
+        # Chargé à la demande : les routes JSON de l'API n'en ont pas besoin
+        if 'translations' not in g:
+            g.translations = load_translations(session['lang'])
         return g.translations.get(key, key)
     return dict(t=t, get_locale=lambda: session.get('lang', 'fr'))
 
@@ -76,12 +80,6 @@ def set_language(lang_code):
 # -------------------- Base de données --------------------
 db.init_app(app)
 
-class Admin(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)
-    role = db.Column(db.String(20), default='admin')
-
 SUPER_ADMIN = {
     'username': 'admin',
     'password_hash': 'scrypt:32768:8:1$r5AYriongkSZfODw$81121a2f07f207e7852af238d6498bcf57cb7e9fea242e885ae35204a81bf57c83c0456af5c456524b14384e0dbe0ac196eece0c244b14fcabffa59a76fa74c4'
@@ -127,26 +125,12 @@ def dashboard():
     else:
         greeting_key = "good_evening"
 
-    # Statistiques globales
-    total_categories = Category.query.count()
-    total_responses = Response.query.count()
-
-    type_counts = {
-        'text': Response.query.filter_by(type='text').count(),
-        'file': Response.query.filter_by(type='file').count(),
-        'link': Response.query.filter_by(type='link').count(),
-        'contact': Response.query.filter_by(type='contact').count(),
-    }
-
-    lang_counts = {
-        'fr': Response.query.filter_by(source_lang='fr').count(),
-        'en': Response.query.filter_by(source_lang='en').count(),
-        'ar': Response.query.filter_by(source_lang='ar').count(),
-    }
+    # Statistiques globales (table content_stat tenue à jour à chaque écriture)
+    stats = get_stats()
 
     logs = []
     if role == 'superadmin':
-        logs = Log.query.order_by(Log.timestamp.desc()).limit(5).all()
+        logs = log_page({}, limit=5)["logs"]
     current_lang = Setting.get_value('CHATBOT_LANGUAGE', 'fr')
 
     return render_template(
@@ -154,14 +138,21 @@ def dashboard():
         username=username,
         role=role,
         greeting_key=greeting_key,
-        total_categories=total_categories,
-        total_responses=total_responses,
-        type_counts=type_counts,
-        lang_counts=lang_counts,
+        **stats,
         logs=logs,
         current_lang=current_lang
     )
 
+@app.route('/dashboard/stats')
+def dashboard_stats():
+    if 'username' not in session:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+
+    # 🔄 ?refresh=1 : recalcul complet par agrégats (superadmin)
+    if request.args.get('refresh') == '1' and session.get('role') == 'superadmin':
+        rebuild_stats()
+    return jsonify(get_stats())
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -260,56 +251,15 @@ def delete_admin(id):
 # -------------------- À partir d'ici tu peux continuer --------------------
 
 # -------------------- Catégories --------------------
-def build_category_tree(categories, parent_id=None, level=0):
-    lang = session.get('lang', 'fr')
-    tree = []
-
-    for cat in categories:
-        if cat.parent_id == parent_id:
-            name = cat.name_fr
-            if lang == 'en':
-                name = cat.name_en or cat.name_fr
-            elif lang == 'ar':
-                name = cat.name_ar or cat.name_fr
-
-            children = build_category_tree(categories, cat.id, level + 1)
-
-            tree.append({
-                'id': cat.id,
-                'parent_id': cat.parent_id,
-                'translated_name': name,
-                'level': level,
-                'response_count': len(cat.responses),
-                'has_children': len(children) > 0,
-                'visible': cat.visible,  # ✅ la clé manquante !
-                'children': children
-            })
-
-    return tree
-
-def flatten_tree(tree):
-    result = []
-
-    def _flatten(nodes):
-        for node in nodes:
-            children = node.pop('children', [])
-            result.append(node)
-            _flatten(children)
-
-    _flatten(tree)
-    return result
-
-
 @app.route('/manage_categories')
 def manage_categories():
     if 'username' not in session:
         return redirect(url_for('login'))
     role = session.get('role')
 
-    categories = Category.query.all()
-    category_tree = build_category_tree(categories)
-    flat_tree = flatten_tree(category_tree)
-    return render_template('manage_categories.html', flat_tree=flat_tree , role=role)
+    flat_tree = get_flat_category_tree(session.get('lang', 'fr'))
+    pending_translations = job_statuses("category")
+    return render_template('manage_categories.html', flat_tree=flat_tree , role=role, pending_translations=pending_translations)
 
 @app.route('/toggle_category_visibility/<int:id>', methods=['POST'])
 def toggle_category_visibility(id):
@@ -349,17 +299,16 @@ def edit_category(id):
         name_ar_manual = request.form.get('name_ar', '').strip()
 
         old_source_value = getattr(category, source_field, '').strip()
+        source_changed = name_source != old_source_value
 
-        if name_source != old_source_value:
-            setattr(category, source_field, name_source)
+        if source_changed:
             category.source_lang = source_lang  # on garde la même langue
-            if source_lang != 'fr':
-                category.name_fr = translate_text(name_source, source_lang, 'fr')
-            if source_lang != 'en':
-                category.name_en = translate_text(name_source, source_lang, 'en')
-            if source_lang != 'ar':
-                category.name_ar = translate_text(name_source, source_lang, 'ar')
+            # 🌍 Les anciennes traductions restent affichées jusqu'à la fin du job
+            setattr(category, source_field, name_source)
         else:
+            manual_names = {'fr': name_fr_manual, 'en': name_en_manual, 'ar': name_ar_manual}
+            if any(manual_names[lang] != (getattr(category, f'name_{lang}') or '') for lang in manual_names if lang != source_lang):
+                cancel_jobs("category", category.id)
             category.name_fr = name_fr_manual if source_lang != 'fr' else category.name_fr
             category.name_en = name_en_manual if source_lang != 'en' else category.name_en
             category.name_ar = name_ar_manual if source_lang != 'ar' else category.name_ar
@@ -370,13 +319,14 @@ def edit_category(id):
         # ✅ Met à jour le champ `visible` selon la case cochée
         category.visible = request.form.get('visible') == 'on'
 
-        db.session.commit()
         log_action("log_edit_category", "category", category.id)
+        db.session.commit()
+        if source_changed:
+            schedule_translation("category", category.id, name_source, source_lang)
         flash("category_updated_success", "success")
         return redirect(url_for('manage_categories'))
 
-    all_categories = Category.query.all()
-    tree = build_category_tree([cat for cat in all_categories if cat.id != id])
+    tree = get_category_tree(session.get('lang', 'fr'), exclude_id=id)
     label_key = f"category_name_{category.source_lang}"
 
     return render_template('edit_category.html',
@@ -405,10 +355,9 @@ def delete_category(id):
         return redirect(url_for('manage_categories'))
 
     db.session.delete(category)
-    db.session.commit()
-
-    # ✅ ENREGISTREMENT DU LOG
+    # ✅ ENREGISTREMENT DU LOG (même transaction)
     log_action("log_delete_category", "category", category.id)
+    db.session.commit()
 
     flash("category_deleted_success", "success")
     return redirect(url_for('manage_categories'))
@@ -421,30 +370,9 @@ def add_category():
     if request.method == 'POST':
         source_name = request.form['name'].strip()
 
-        try:
-            detected_lang = detect(source_name)
-        except:
-            detected_lang = "fr"
-
-        # Initialisation des noms
-        name_fr = name_en = name_ar = ""
-
-        if detected_lang == "fr":
-            name_fr = source_name
-            name_en = translate_text(name_fr, source_lang='fr', target_lang='en')
-            name_ar = translate_text(name_fr, source_lang='fr', target_lang='ar')
-        elif detected_lang == "en":
-            name_en = source_name
-            name_fr = translate_text(name_en, source_lang='en', target_lang='fr')
-            name_ar = translate_text(name_fr, source_lang='fr', target_lang='ar')
-        elif detected_lang == "ar":
-            name_ar = source_name
-            name_fr = translate_text(name_ar, source_lang='ar', target_lang='fr')
-            name_en = translate_text(name_fr, source_lang='fr', target_lang='en')
-        else:
-            name_fr = source_name
-            name_en = translate_text(name_fr, source_lang='fr', target_lang='en')
-            name_ar = translate_text(name_fr, source_lang='fr', target_lang='ar')
+        # Traduction des noms en arrière-plan (le français sert de pivot, langue inconnue traitée comme du français)
+        translation_lang = identify_lang(source_name, default="fr")
+        names = placeholder_fields("category", source_name)
 
         parent_id = request.form.get('parent_id') or None
         if parent_id == '':
@@ -454,25 +382,24 @@ def add_category():
         visible = request.form.get('visible') == 'on'
 
         new_cat = Category(
-            name_fr=name_fr,
-            name_en=name_en,
-            name_ar=name_ar,
+            **names,
             parent_id=parent_id,
-            source_lang=detected_lang,
+            source_lang=translation_lang,
             visible=visible
         )
         db.session.add(new_cat)
+        db.session.flush()
+        log_action("log_add_category", "category", new_cat.id)
         db.session.commit()
+        schedule_translation("category", new_cat.id, source_name, translation_lang, pivot="fr")
 
-        log_action("log_add_category", "category", new_cat.id)
         flash("category_added_success", "success")
         return redirect(url_for('manage_categories'))
 
     parent_id = request.args.get('parent_id')
     selected_parent = Category.query.get(parent_id) if parent_id else None
     role = session.get('role')
-    all_categories = Category.query.all()
-    category_tree = build_category_tree(all_categories)
+    category_tree = get_category_tree(session.get('lang', 'fr'))
 
     return render_template('add_category.html', tree=category_tree, selected_parent=selected_parent, role=role)
 
@@ -485,39 +412,25 @@ def add_response_for_category(category_id):
     category = Category.query.get_or_404(category_id)
 
     if request.method == 'POST':
+        limit_upload_request(request)
         response_type = request.form.get('type')
 
         if response_type in ['form', 'chat']:
             flash("invalid_response_type", "danger")
             return redirect(request.url)
 
-        answer_fr = answer_en = answer_ar = file_url = None
+        answer_fr = answer_en = answer_ar = file_url = stored = None
         source_lang = "fr"  # valeur par défaut
+        pending_text = None
 
         if response_type == 'text':
             content = request.form.get('content')
-            try:
-                detected_lang = detect(content)
-                if detected_lang not in ["fr", "en", "ar"]:
-                    detected_lang = "fr"
-                source_lang = detected_lang
-
-                if detected_lang == "fr":
-                    answer_fr = content
-                    answer_en = translate_text(content, "fr", "en")
-                    answer_ar = translate_text(content, "fr", "ar")
-                elif detected_lang == "en":
-                    answer_en = content
-                    answer_fr = translate_text(content, "en", "fr")
-                    answer_ar = translate_text(answer_fr, "fr", "ar")
-                elif detected_lang == "ar":
-                    answer_ar = content
-                    answer_fr = translate_text(content, "ar", "fr")
-                    answer_en = translate_text(answer_fr, "fr", "en")
-
-            except Exception:
-                answer_fr = answer_en = answer_ar = "[ERROR] " + content
-                source_lang = "fr"
+            source_lang = identify_lang(content, default="fr")
+
+            # ⏳ Texte source enregistré tout de suite, traductions en arrière-plan
+            answers = placeholder_fields("response", content)
+            answer_fr, answer_en, answer_ar = answers["answer_fr"], answers["answer_en"], answers["answer_ar"]
+            pending_text = content
 
         elif response_type == 'link':
             link = request.form.get('link')
@@ -532,10 +445,13 @@ def add_response_for_category(category_id):
         elif response_type == 'file':
             uploaded_file = request.files.get('file')
             if uploaded_file and uploaded_file.filename:
-                filename = secure_filename(uploaded_file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                uploaded_file.save(file_path)
-                file_url = file_path
+                # 🗂️ Stockage par hash du contenu (un seul exemplaire pour des envois identiques)
+                try:
+                    stored = store_upload(uploaded_file)
+                except UploadTooLarge:
+                    flash("file_too_large", "danger")
+                    return redirect(request.url)
+                file_url = stored_file_url(stored)
             source_lang = None
 
         new_response = Response(
@@ -548,10 +464,14 @@ def add_response_for_category(category_id):
             category_id=category.id
         )
         db.session.add(new_response)
-        db.session.commit()
-
-        # ✅ ENREGISTREMENT DU LOG
+        db.session.flush()
+        # ✅ ENREGISTREMENT DU LOG (même transaction)
         log_action("log_add_response", "response", new_response.id)
+        db.session.commit()
+        if pending_text:
+            schedule_translation("response", new_response.id, pending_text, source_lang, pivot="fr")
+        if stored is not None:
+            schedule_processing([stored.digest])
 
         flash("response_added_success", "success")
         return redirect(url_for('responses_by_category', category_id=category.id))
@@ -566,6 +486,7 @@ def edit_response(response_id):
     response = Response.query.get_or_404(response_id)
 
     if request.method == 'POST':
+        limit_upload_request(request)
         new_type = request.form.get('type')
 
         if new_type in ['form', 'chat']:
@@ -573,6 +494,7 @@ def edit_response(response_id):
             return redirect(request.url)
 
         response.type = new_type
+        pending_text = stored = None
 
         if new_type == 'text':
             new_fr = request.form.get('answer_fr', '').strip()
@@ -580,35 +502,21 @@ def edit_response(response_id):
             new_ar = request.form.get('answer_ar', '').strip()
 
             source_lang = response.source_lang or "fr"
-
-            if source_lang == "fr":
-                if new_fr != response.answer_fr:
-                    response.answer_fr = new_fr
-                    response.answer_en = translate_text(new_fr, "fr", "en")
-                    response.answer_ar = translate_text(new_fr, "fr", "ar")
-                else:
-                    response.answer_en = new_en or response.answer_en
-                    response.answer_ar = new_ar or response.answer_ar
-
-            elif source_lang == "en":
-                if new_en != response.answer_en:
-                    response.answer_en = new_en
-                    fr = translate_text(new_en, "en", "fr")
-                    response.answer_fr = fr
-                    response.answer_ar = translate_text(fr, "fr", "ar")
-                else:
-                    response.answer_fr = new_fr or response.answer_fr
-                    response.answer_ar = new_ar or response.answer_ar
-
-            elif source_lang == "ar":
-                if new_ar != response.answer_ar:
-                    response.answer_ar = new_ar
-                    fr = translate_text(new_ar, "ar", "fr")
-                    response.answer_fr = fr
-                    response.answer_en = translate_text(fr, "fr", "en")
-                else:
-                    response.answer_fr = new_fr or response.answer_fr
-                    response.answer_en = new_en or response.answer_en
+            if source_lang not in ["fr", "en", "ar"]:
+                source_lang = "fr"
+            submitted = {"fr": new_fr, "en": new_en, "ar": new_ar}
+            source_field = f"answer_{source_lang}"
+
+            if submitted[source_lang] != getattr(response, source_field):
+                # 🌍 Les anciennes traductions restent en place jusqu'à la fin du job
+                setattr(response, source_field, submitted[source_lang])
+                pending_text = submitted[source_lang]
+            else:
+                manual = {lang: value for lang, value in submitted.items() if lang != source_lang and value}
+                if any(value != getattr(response, f"answer_{lang}") for lang, value in manual.items()):
+                    cancel_jobs("response", response.id)
+                for lang, value in manual.items():
+                    setattr(response, f"answer_{lang}", value)
 
         elif new_type == 'link':
             response.answer_fr = request.form.get('link', '').strip()
@@ -623,15 +531,23 @@ def edit_response(response_id):
         elif new_type == 'file':
             uploaded_file = request.files.get('file')
             if uploaded_file and uploaded_file.filename:
-                filename = secure_filename(uploaded_file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                uploaded_file.save(file_path)
-                response.file_url = file_path
+                try:
+                    stored = store_upload(uploaded_file)
+                except UploadTooLarge:
+                    flash("file_too_large", "danger")
+                    return redirect(request.url)
+                response.file_url = stored_file_url(stored)
 
-        db.session.commit()
+        if new_type != 'text':
+            cancel_jobs("response", response.id)
 
-        # ✅ ENREGISTREMENT DU LOG
+        # ✅ ENREGISTREMENT DU LOG (même transaction)
         log_action("log_edit_response", "response", response.id)
+        db.session.commit()
+        if pending_text:
+            schedule_translation("response", response.id, pending_text, source_lang, pivot="fr")
+        if stored is not None:
+            schedule_processing([stored.digest])
 
         flash("response_edited_success", "success")
         return redirect(url_for('responses_by_category', category_id=response.category_id))
@@ -649,12 +565,14 @@ def responses_by_category(category_id):
 
     lang_code = session.get("lang", "fr")
     lang_attr = "answer_" + lang_code
+    pending_translations = job_statuses("response", [r.id for r in responses])
 
     return render_template(
         'responses_by_category.html',
         category=category,
         responses=responses,
         lang_attr=lang_attr,
+        pending_translations=pending_translations,
         role=role
     )
 
@@ -668,40 +586,90 @@ def delete_response(response_id):
     category_id = response.category_id  # on sauvegarde avant suppression
 
     db.session.delete(response)
-    db.session.commit()
-
-    # ✅ ENREGISTREMENT DU LOG
+    # ✅ ENREGISTREMENT DU LOG (même transaction)
     log_action("log_delete_response", "response", response_id)
+    db.session.commit()
 
     flash("Réponse supprimée avec succès.", "success")
     return redirect(url_for('responses_by_category', category_id=category_id))
 
-@app.route('/uploads/<path:filename>')
-def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+# -------------------- Import / export en masse --------------------
+@app.route('/content/import', methods=['POST'])
+def import_content():
+    if 'username' not in session:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
 
+    uploaded = request.files.get('file')
+    if not uploaded or not uploaded.filename:
+        return jsonify({"success": False, "error": "missing file"}), 400
 
-def log_action(action, target_type, target_id=None):
-    if 'admin_id' in session:
-        print("✅ LOG enregistré :", action, target_type, target_id)  # 🔍 debug console
+    fmt = request.form.get('format') or ('csv' if uploaded.filename.lower().endswith('.csv') else 'jsonl')
+    if fmt not in ['jsonl', 'csv']:
+        return jsonify({"success": False, "error": "invalid format"}), 400
+
+    # 📥 Fichier copié sur disque puis importé en arrière-plan (pas de timeout HTTP)
+    fd, path = tempfile.mkstemp(suffix='.' + fmt)
+    with os.fdopen(fd, 'wb') as f:
+        uploaded.save(f)
+
+    run_id = start_import(app, path, fmt, translate=request.form.get('translate', 'true') != 'false')
+    log_action_later("log_import_content", "content")
+    return jsonify({"success": True, "run_id": run_id, "status_url": url_for('import_content_status', run_id=run_id)}), 202
+
+@app.route('/content/import/<run_id>')
+def import_content_status(run_id):
+    if 'username' not in session:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+
+    run = import_runs.get(run_id)
+    if run is None:
+        return jsonify({"success": False, "error": "not found"}), 404
+    return jsonify({"success": True, **run})
+
+@app.route('/content/export')
+def export_content():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in ['jsonl', 'csv']:
+        fmt = 'jsonl'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return app.response_class(
+        stream_with_context(export_lines(fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=chatbot_content.{fmt}"}
+    )
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    # Envoi au-delà de CHATBOT_MAX_UPLOAD_MB (cf. limit_upload_request)
+    flash("file_too_large", "danger")
+    return redirect(request.url)
+
+
+@app.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    # ETag fort + cache long, requêtes Range, délégation éventuelle au proxy (cf. file_store)
+    return send_stored_file(filename)
 
-        new_log = Log(
-            admin_id=session['admin_id'],
-            action=action,
-            target_type=target_type,
-            target_id=target_id
-        )
-        db.session.add(new_log)
-        db.session.commit()
 
 @app.route('/logs')
 def show_logs():
     if 'username' not in session or session.get('role') != 'superadmin':
         return redirect(url_for('login'))
 
-    logs = Log.query.order_by(Log.timestamp.desc()).all()
+    # 📄 Une page à la fois (curseur after/before), filtres passés en paramètres GET
+    filters = parse_log_filters(request.args)
+    page = log_page(filters, after=request.args.get('after'), before=request.args.get('before'))
 
-    return render_template('logs.html', logs=logs, role=session.get('role'))
+    return render_template('logs.html',
+                           **page,
+                           filters=filters,
+                           admins=Admin.query.order_by(Admin.username).all(),
+                           log_actions=LOG_ACTIONS,
+                           log_target_types=LOG_TARGET_TYPES,
+                           role=session.get('role'))
 
 
 from api_routes import api_bp
@@ -710,10 +678,25 @@ app.register_blueprint(api_bp)
 from text_api import text_api_bp
 app.register_blueprint(text_api_bp)
 
-from preload_utils import preload_all_languages
+from preload_utils import start_background_warmup
+
+# 🔥 Préchargement des embeddings en arrière-plan (progression : /api/health/ready)
+start_background_warmup(app)
+
+# 🌍 Traductions des contenus admin en arrière-plan (jobs persistés dans translation_job)
+start_translation_worker(app)
+
+# 🗂️ Pièces jointes : table stored_file, anciens fichiers repris dans le stockage par hash
+init_file_store(app)
+
+# 🖼️ Miniatures / extraction de texte des pièces jointes + ramasse-miettes périodique
+start_file_worker(app)
+
+# 🧾 Journal des actions : index de pagination + écriture par lots des entrées hors transaction
+start_audit_writer(app)
 
-with app.app_context():
-    preload_all_languages()
+# 📊 Compteurs du tableau de bord (table content_stat, initialisée par agrégats au premier démarrage)
+init_stats(app)
 
 @app.route('/settings', methods=['POST'])
 def update_settings():
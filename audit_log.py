@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import session
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import joinedload
+from models import db, Log
+
+# === Journal des actions admin ===
+# Écriture : log_action ajoute la ligne à la transaction en cours, elle est donc validée
+# (ou annulée) avec la modification qu'elle décrit. Les actions sans écriture en base
+# (ex. lancement d'un import) passent par log_action_later : les lignes sont mises en file
+# et insérées par lots par un thread dédié.
+# Lecture : pagination par curseur (timestamp, id) sur des index composites,
+# le coût d'une page ne dépend pas de la taille de la table.
+
+AUDIT_BATCH_SIZE = int(os.environ.get("CHATBOT_AUDIT_BATCH_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("CHATBOT_AUDIT_FLUSH_INTERVAL", 1))
+LOG_PAGE_SIZE = 50
+
+LOG_ACTIONS = [
+    "log_add_category", "log_edit_category", "log_delete_category",
+    "log_add_response", "log_edit_response", "log_delete_response",
+    "log_import_content",
+]
+LOG_TARGET_TYPES = ["category", "response", "content"]
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+# --- Écriture ---
+def log_action(action, target_type, target_id=None):
+    # ✅ Même transaction que la modification : le commit de l'appelant enregistre les deux
+    if 'admin_id' in session:
+        db.session.add(Log(admin_id=session['admin_id'], action=action, target_type=target_type, target_id=target_id))
+
+
+def log_action_later(action, target_type, target_id=None):
+    if 'admin_id' not in session:
+        return
+    row = {
+        "admin_id": session['admin_id'],
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "timestamp": datetime.utcnow()
+    }
+    if _writer is None:
+        write_rows([row])
+    else:
+        _queue.put(row)
+
+
+def write_rows(rows):
+    # 📦 Un seul INSERT multi-lignes par lot
+    db.session.execute(insert(Log), rows)
+    db.session.commit()
+
+
+def _next_batch():
+    rows = [_queue.get()]
+    deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+    while len(rows) < AUDIT_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            rows.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return rows
+
+
+def _run(app):
+    with app.app_context():
+        while True:
+            rows = _next_batch()
+            try:
+                write_rows(rows)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Écriture de {len(rows)} lignes du journal en erreur :", e)
+            finally:
+                db.session.remove()
+                for _ in rows:
+                    _queue.task_done()
+
+
+def wait_for_audit_log():
+    if _writer is not None:
+        _queue.join()
+
+
+def start_audit_writer(app):
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            return _writer
+
+        with app.app_context():
+            # 📇 Bases existantes : create_all ne crée pas les index d'une table déjà présente
+            for index in Log.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+
+        _writer = threading.Thread(target=_run, args=(app,), name="audit-log", daemon=True)
+        _writer.start()
+    return _writer
+
+
+# --- Lecture ---
+def encode_cursor(log):
+    return f"{log.timestamp.isoformat()}_{log.id}"
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, log_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_log_filters(args):
+    filters = {}
+    for key in ("admin_id", "target_id"):
+        value = args.get(key, "").strip()
+        if value.isdigit():
+            filters[key] = int(value)
+    for key, allowed in (("action", LOG_ACTIONS), ("target_type", LOG_TARGET_TYPES)):
+        value = args.get(key, "")
+        if value in allowed:
+            filters[key] = value
+    return filters
+
+
+def log_page(filters, after=None, before=None, limit=LOG_PAGE_SIZE):
+    query = Log.query.options(joinedload(Log.admin)).filter_by(**filters)
+
+    # ⏪ "before" : page plus récente, lue en ordre croissant puis remise dans l'ordre d'affichage
+    newer = decode_cursor(before) if before else None
+    older = decode_cursor(after) if after and newer is None else None
+
+    if newer:
+        timestamp, log_id = newer
+        query = query.filter(or_(Log.timestamp > timestamp, and_(Log.timestamp == timestamp, Log.id > log_id)))
+        rows = query.order_by(Log.timestamp.asc(), Log.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        logs = rows[:limit][::-1]
+        has_newer, has_older = has_more, True
+    else:
+        if older:
+            timestamp, log_id = older
+            query = query.filter(or_(Log.timestamp < timestamp, and_(Log.timestamp == timestamp, Log.id < log_id)))
+        rows = query.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        logs = rows[:limit]
+        has_newer, has_older = older is not None, has_more
+
+    return {
+        "logs": logs,
+        "newer_cursor": encode_cursor(logs[0]) if logs and has_newer else None,
+        "older_cursor": encode_cursor(logs[-1]) if logs and has_older else None,
+    }
@@ -0,0 +1,87 @@
+import json
+import time
+from pathlib import Path
+from langdetect import detect, DetectorFactory
+from lang_id import identify_lang, _identify
+
+# === Banc d'essai : lang_id contre langdetect ===
+# Usage : python bench_lang_id.py
+# Textes étiquetés : réponses de intents.json (déjà rangées par langue) et champs
+# *_fr / *_en / *_ar des catégories et réponses en base, plus des messages de 1 à 3 mots
+# ("merci", "svp", "ok") : langue attendue None = mot neutre, la langue par défaut s'applique.
+# Affiche la précision et la latence moyenne par appel de chaque méthode.
+
+LANGS = ["fr", "en", "ar"]
+DetectorFactory.seed = 0
+
+
+SHORT_SAMPLES = [
+    ("merci", "fr"), ("Merci beaucoup", "fr"), ("svp", "fr"), ("stp", "fr"), ("bonjour", "fr"), ("salut", "fr"),
+    ("aide", "fr"), ("aide svp", "fr"), ("oui", "fr"), ("non", "fr"), ("d'accord", "fr"), ("au revoir", "fr"),
+    ("bonne journée", "fr"), ("ok merci", "fr"),
+    ("thanks", "en"), ("thank you", "en"), ("please", "en"), ("hello", "en"), ("hi", "en"), ("help", "en"),
+    ("help please", "en"), ("yes", "en"), ("no", "en"), ("bye", "en"), ("good morning", "en"), ("ok thanks", "en"),
+    ("ok", None), ("OK !", None), ("okay", None),
+    ("شكرا", "ar"), ("مرحبا", "ar"),
+]
+
+
+def intent_samples():
+    path = Path("intents.json")
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        (text, lang)
+        for intent in data.get("intents", [])
+        for lang, texts in intent.get("responses", {}).items() if lang in LANGS
+        for text in texts if text.strip()
+    ]
+
+
+def db_samples():
+    from app import app
+    from models import Category, Response
+
+    samples = []
+    with app.app_context():
+        for row in Category.query.all():
+            samples += [(getattr(row, f"name_{lang}"), lang) for lang in LANGS]
+        for row in Response.query.filter_by(type="text").all():
+            samples += [(getattr(row, f"answer_{lang}"), lang) for lang in LANGS]
+    # Les traductions en attente ou en échec ne sont pas étiquetables
+    return [(text, lang) for text, lang in samples if text and text.strip() and not text.startswith("[")]
+
+
+def langdetect_lang(text):
+    try:
+        return detect(text)
+    except Exception:
+        return None
+
+
+def run(name, identify, samples):
+    errors = []
+    start = time.perf_counter()
+    for text, lang in samples:
+        found = identify(text)
+        if found != lang:
+            errors.append((lang, found, text))
+    elapsed = time.perf_counter() - start
+
+    accuracy = 100 * (len(samples) - len(errors)) / len(samples)
+    print(f"{name:<22} précision {accuracy:6.2f} %   {1e6 * elapsed / len(samples):9.1f} µs/appel")
+    for lang, found, text in errors[:10]:
+        print(f"    attendu {lang}, obtenu {found} : {text[:70]!r}")
+
+
+if __name__ == "__main__":
+    samples = SHORT_SAMPLES + intent_samples() + db_samples()
+    print(f"{len(samples)} textes étiquetés")
+
+    run("langdetect", langdetect_lang, samples)
+    run("lang_id (sans cache)", lambda text: _identify(text, None), samples)
+    for text, _ in samples:
+        identify_lang(text, None)
+    run("lang_id (cache chaud)", lambda text: identify_lang(text, None), samples)
@@ -0,0 +1,49 @@
+import sys
+import time
+import numpy as np
+from retrieval_index import FlatIndex, IVFIndex, to_matrix
+
+# === Benchmark : index IVF vs recherche exacte (flat) ===
+# Usage : python bench_retrieval.py [nb_vecteurs] [nb_requetes] [n_probe]
+# Sans argument, utilise des vecteurs synthétiques regroupés en clusters
+# (dimension 384, comme all-MiniLM-L12-v2).
+
+n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+n_probe = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+dim, k = 384, 5
+
+rng = np.random.default_rng(42)
+centers = to_matrix(rng.normal(size=(max(1, n_rows // 50), dim)))
+labels = rng.integers(0, centers.shape[0], size=n_rows)
+corpus = to_matrix(centers[labels] + 0.35 * rng.normal(size=(n_rows, dim)) / np.sqrt(dim) * 4)
+queries = to_matrix(corpus[rng.integers(0, n_rows, size=n_queries)] + 0.1 * rng.normal(size=(n_queries, dim)) / np.sqrt(dim) * 4)
+
+print(f"[DATA] {n_rows} vecteurs, {n_queries} requêtes, dim={dim}, k={k}")
+
+start = time.perf_counter()
+flat = FlatIndex(corpus)
+print(f"[BUILD] flat : {(time.perf_counter() - start) * 1000:.1f} ms")
+
+start = time.perf_counter()
+ivf = IVFIndex(corpus, n_probe=n_probe)
+print(f"[BUILD] ivf  : {(time.perf_counter() - start) * 1000:.1f} ms ({ivf.centroids.shape[0]} listes, n_probe={n_probe})")
+
+
+def run(index):
+    results, timings = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, indices = index.search(q, k)
+        timings.append(time.perf_counter() - start)
+        results.append(set(indices.tolist()))
+    return results, np.array(timings) * 1000
+
+
+exact, flat_ms = run(flat)
+approx, ivf_ms = run(ivf)
+recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+
+print(f"[FLAT] p50 = {np.percentile(flat_ms, 50):.3f} ms | p95 = {np.percentile(flat_ms, 95):.3f} ms")
+print(f"[IVF]  p50 = {np.percentile(ivf_ms, 50):.3f} ms | p95 = {np.percentile(ivf_ms, 95):.3f} ms")
+print(f"[RESULT] recall@{k} = {recall:.3f} | speedup p50 = x{np.percentile(flat_ms, 50) / np.percentile(ivf_ms, 50):.1f}")
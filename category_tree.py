@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from sqlalchemy import func
+from models import db, Category, Response
+from content_events import on_content_change
+
+# === Arbre des catégories pour les pages d'administration ===
+# Une seule requête (catégories + nombre de réponses par catégorie), construction en O(n)
+# grâce à un index parent -> enfants, puis mise en cache par langue.
+# Le cache est vidé à chaque écriture sur Category/Response (content_events) ;
+# le TTL couvre les écritures faites par un autre processus.
+
+CATEGORY_TREE_TTL = float(os.environ.get("CHATBOT_CATEGORY_TREE_TTL", 300))
+
+_trees = {}  # lang -> (expiration, arbre, liste aplatie)
+_version = 0
+_lock = threading.Lock()
+
+
+def _translated_name(row, lang):
+    if lang == 'en':
+        return row.name_en or row.name_fr
+    if lang == 'ar':
+        return row.name_ar or row.name_fr
+    return row.name_fr
+
+
+def _load_rows():
+    response_counts = (
+        db.session.query(Response.category_id, func.count(Response.id).label("response_count"))
+        .group_by(Response.category_id)
+        .subquery()
+    )
+    return (
+        db.session.query(
+            Category.id, Category.parent_id, Category.name_fr, Category.name_en, Category.name_ar, Category.visible,
+            func.coalesce(response_counts.c.response_count, 0).label("response_count")
+        )
+        .outerjoin(response_counts, response_counts.c.category_id == Category.id)
+        .order_by(Category.id)
+        .all()
+    )
+
+
+def _build(rows, lang):
+    children_of = {}
+    for row in rows:
+        children_of.setdefault(row.parent_id, []).append(row)
+
+    def _nodes(parent_id, level):
+        nodes = []
+        for row in children_of.get(parent_id, []):
+            children = _nodes(row.id, level + 1)
+            nodes.append({
+                'id': row.id,
+                'parent_id': row.parent_id,
+                'translated_name': _translated_name(row, lang),
+                'level': level,
+                'response_count': row.response_count,
+                'has_children': len(children) > 0,
+                'visible': row.visible,
+                'children': children
+            })
+        return nodes
+
+    tree = _nodes(None, 0)
+
+    flat = []
+    stack = list(reversed(tree))
+    while stack:
+        node = stack.pop()
+        flat.append({k: v for k, v in node.items() if k != 'children'})
+        stack.extend(reversed(node['children']))
+    return tree, flat
+
+
+def _get(lang):
+    with _lock:
+        entry = _trees.get(lang)
+        version = _version
+    if entry is not None and entry[0] > time.monotonic():
+        return entry
+
+    tree, flat = _build(_load_rows(), lang)
+    entry = (time.monotonic() + CATEGORY_TREE_TTL, tree, flat)
+    with _lock:
+        # ⏭️ Une écriture a eu lieu pendant la construction : on ne met pas en cache
+        if version == _version:
+            _trees[lang] = entry
+    return entry
+
+
+def get_category_tree(lang, exclude_id=None):
+    # ⚠️ Structure partagée par le cache : ne pas la modifier
+    tree = _get(lang)[1]
+    if exclude_id is None:
+        return tree
+    return _without_subtree(tree, exclude_id)
+
+
+def get_flat_category_tree(lang):
+    return _get(lang)[2]
+
+
+def _without_subtree(nodes, category_id):
+    # Catégorie éditée retirée avec ses descendants (un parent ne peut pas être son propre enfant)
+    result = []
+    for node in nodes:
+        if node['id'] == category_id:
+            continue
+        children = _without_subtree(node['children'], category_id)
+        result.append(dict(node, children=children, has_children=len(children) > 0))
+    return result
+
+
+@on_content_change
+def invalidate_category_trees(changes):
+    global _version
+    with _lock:
+        _version += 1
+        _trees.clear()
@@ -0,0 +1,82 @@
+import sys
+from flask import Flask
+from sqlalchemy import event
+from models import db, Category, Response, ContentStat
+from navigation import get_snapshot, invalidate_navigation
+
+# === Non-régression N+1 sur l'API de navigation ===
+# Usage : python check_navigation_queries.py [sqlite:///db.sqlite3]
+# Ajoute temporairement des catégories (transaction annulée à la fin) et vérifie que
+# le nombre de requêtes SQL par appel ne dépend pas du nombre de catégories.
+# L'instantané de navigation est vidé avant chaque appel : on mesure sa reconstruction,
+# c'est-à-dire les lectures dont dépendent les trois routes (api_routes sert tout depuis l'instantané).
+# Application minimale (modèles seuls) : ni encodeur ni threads d'arrière-plan, et seules
+# les requêtes de la connexion de la transaction de test sont comptées.
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = sys.argv[1] if len(sys.argv) > 1 else 'sqlite:///db.sqlite3'
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db.init_app(app)
+
+SIZES = [5, 300]
+
+statements = []
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def seed(count):
+    # count catégories racines, dont la première a elle-même count sous-catégories
+    roots = [Category(name_fr=f"__check_root_{i}__", visible=True) for i in range(count)]
+    db.session.add_all(roots)
+    db.session.flush()
+
+    children = [Category(name_fr=f"__check_{i}__", parent_id=roots[0].id, visible=True) for i in range(count)]
+    db.session.add_all(children)
+    db.session.flush()
+
+    db.session.add_all([Category(name_fr=f"__check_{i}_sub__", parent_id=c.id, visible=True) for i, c in enumerate(roots[1::2] + children[::2])])
+    db.session.add_all([Response(type="text", answer_fr=f"__check_{i}__", category_id=c.id) for i, c in enumerate(roots + children)])
+    db.session.flush()
+    return roots[0]
+
+
+def measure(read):
+    invalidate_navigation()
+    statements.clear()
+    read(get_snapshot())
+    return len(statements)
+
+
+results = {}
+with app.app_context():
+    ContentStat.__table__.create(db.engine, checkfirst=True)  # lue pour la version de l'instantané
+    connection = db.session.connection()
+    event.listen(connection, "before_cursor_execute", _count)
+    try:
+        for size in SIZES:
+            root = seed(size)
+            results[size] = {
+                "/api/categories": measure(lambda snapshot: snapshot.category_nodes(None, "fr")),
+                "/api/categories/<id>/subcategories": measure(lambda snapshot: snapshot.category_nodes(root.id, "fr")),
+                "/api/categories/<id>/responses": measure(lambda snapshot: snapshot.category_responses(root.id, "fr"))
+            }
+            db.session.rollback()
+            connection = db.session.connection()
+            event.listen(connection, "before_cursor_execute", _count)
+    finally:
+        db.session.rollback()
+
+failed = False
+for endpoint in results[SIZES[0]]:
+    counts = [results[size][endpoint] for size in SIZES]
+    print(f"[SQL] {endpoint} : " + " | ".join(f"{size} catégories -> {count} requêtes" for size, count in zip(SIZES, counts)))
+    if len(set(counts)) > 1:
+        failed = True
+
+if failed:
+    print("[RESULT] ❌ Le nombre de requêtes dépend du nombre de catégories (N+1)")
+    sys.exit(1)
+print("[RESULT] ✅ Nombre de requêtes constant")
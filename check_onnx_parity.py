@@ -0,0 +1,46 @@
+import json
+import sys
+import time
+import numpy as np
+from encoder_backend import load_encoder
+
+# === Parité PyTorch / ONNX sur les patterns de intents.json ===
+# Usage : python check_onnx_parity.py [onnx|onnx-int8]
+# Échoue (code 1) si un pattern a une similarité cosinus trop faible avec l'embedding PyTorch.
+
+MODEL_PATH = "models/all-MiniLM-L12-v2"
+MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.97}
+
+backend = sys.argv[1] if len(sys.argv) > 1 else "onnx"
+
+with open("intents.json", "r", encoding="utf-8") as f:
+    patterns = [p for intent in json.load(f)["intents"] for p in intent["patterns"] if p.strip()]
+
+reference, _ = load_encoder(MODEL_PATH, "torch")
+candidate, loaded = load_encoder(MODEL_PATH, backend)
+if loaded != backend:
+    print(f"[ERROR] Backend {backend} non chargé")
+    sys.exit(1)
+
+
+def encode(model):
+    start = time.perf_counter()
+    embeddings = model.encode(patterns, convert_to_numpy=True, normalize_embeddings=True)
+    return embeddings, (time.perf_counter() - start) * 1000
+
+
+ref_embeddings, ref_ms = encode(reference)
+cand_embeddings, cand_ms = encode(candidate)
+cosines = np.sum(ref_embeddings * cand_embeddings, axis=1)
+
+print(f"[PATTERNS] {len(patterns)} phrases")
+print(f"[TIME] torch = {ref_ms:.1f} ms | {backend} = {cand_ms:.1f} ms")
+print(f"[COSINE] min = {cosines.min():.5f} | moyenne = {cosines.mean():.5f}")
+
+worst = int(cosines.argmin())
+print(f"[WORST] {patterns[worst]!r} -> {cosines[worst]:.5f}")
+
+if cosines.min() < MIN_COSINE[backend]:
+    print(f"[RESULT] ❌ Parité insuffisante (seuil {MIN_COSINE[backend]})")
+    sys.exit(1)
+print("[RESULT] ✅ Parité OK")
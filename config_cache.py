@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+
+# === Cache de configuration (Setting) et des fichiers de traduction de l'interface ===
+# Les paramètres sont chargés en une requête puis servis depuis la mémoire ;
+# Setting.set_value recharge le cache, le TTL couvre les écritures d'un autre processus.
+# Les fichiers translations/<lang>.json sont lus une fois puis relus seulement si leur mtime change
+# (vérifié au plus toutes les I18N_CHECK_INTERVAL secondes).
+# Chaque rechargement incrémente un numéro de version.
+
+SETTINGS_TTL = float(os.environ.get("CHATBOT_SETTINGS_TTL", 30))
+I18N_DIR = "translations"
+I18N_CHECK_INTERVAL = float(os.environ.get("CHATBOT_I18N_CHECK_INTERVAL", 2))
+
+
+class SettingsCache:
+    def __init__(self, ttl=SETTINGS_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._values = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from models import Setting
+
+        values = {setting.key: setting.value for setting in Setting.query.all()}
+        with self._lock:
+            self._values = values
+            self._expires_at = time.monotonic() + self.ttl
+            self.version += 1
+        return values
+
+    def get(self, key, default=None):
+        values = self._values
+        if values is None or self._expires_at < time.monotonic():
+            values = self._load()
+        return values.get(key, default)
+
+    def reload(self):
+        return self._load()
+
+
+class TranslationBundles:
+    def __init__(self, directory=I18N_DIR, check_interval=I18N_CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.version = 0
+        self._bundles = {}  # lang -> (mtime, prochaine vérification, dictionnaire)
+        self._lock = threading.Lock()
+
+    def _path(self, lang):
+        return os.path.join(self.directory, f"{lang}.json")
+
+    def get(self, lang):
+        entry = self._bundles.get(lang)
+        now = time.monotonic()
+        if entry is not None and entry[1] > now:
+            return entry[2]
+
+        try:
+            mtime = os.stat(self._path(lang)).st_mtime
+        except OSError:
+            return {}
+
+        if entry is not None and entry[0] == mtime:
+            self._bundles[lang] = (mtime, now + self.check_interval, entry[2])
+            return entry[2]
+
+        # 🔄 Premier chargement ou fichier modifié sur disque
+        try:
+            with open(self._path(lang), encoding='utf-8') as f:
+                bundle = json.load(f)
+        except (OSError, ValueError):
+            return entry[2] if entry else {}
+
+        with self._lock:
+            self._bundles[lang] = (mtime, now + self.check_interval, bundle)
+            self.version += 1
+        return bundle
+
+
+settings_cache = SettingsCache()
+translation_bundles = TranslationBundles()
+
+
+def config_version():
+    return {"settings": settings_cache.version, "translations": translation_bundles.version}
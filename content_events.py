@@ -0,0 +1,67 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Category, Response
+
+# === Suivi des modifications de contenu (Category / Response) ===
+# Les changements sont collectés à chaque flush puis diffusés aux abonnés
+# uniquement après un commit réussi (jamais après un rollback).
+
+CONTENT_MODELS = {Category: "category", Response: "response"}
+
+_listeners = []
+
+
+def on_content_change(callback):
+    _listeners.append(callback)
+    return callback
+
+
+def _pending(session):
+    return session.info.setdefault("content_changes", {})
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = _pending(session)
+
+    for obj in session.new:
+        kind = CONTENT_MODELS.get(type(obj))
+        if kind:
+            pending[(kind, obj.id)] = "upsert"
+
+    for obj in session.dirty:
+        kind = CONTENT_MODELS.get(type(obj))
+        if kind and session.is_modified(obj, include_collections=False):
+            pending[(kind, obj.id)] = "upsert"
+
+    for obj in session.deleted:
+        kind = CONTENT_MODELS.get(type(obj))
+        if kind:
+            pending[(kind, obj.id)] = "delete"
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    changes = session.info.pop("content_changes", None)
+    if not changes:
+        return
+
+    publish_changes([
+        {"kind": kind, "id": obj_id, "op": op}
+        for (kind, obj_id), op in changes.items()
+    ])
+
+
+def publish_changes(changes):
+    # Aussi appelé directement quand un contenu dérivé change sans écriture sur Category/Response
+    # (ex. texte extrait d'une pièce jointe)
+    for callback in _listeners:
+        try:
+            callback(changes)
+        except Exception as e:
+            print("❌ Erreur de synchronisation du contenu :", e)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("content_changes", None)
@@ -0,0 +1,411 @@
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import or_
+from models import db, Category, Response
+from translation_jobs import schedule_translations, wait_for_jobs
+
+# === Import / export en masse des catégories et réponses ===
+# Formats : JSONL (un objet par ligne) ou CSV (mêmes colonnes).
+#   catégorie : {"kind": "category", "ref": "...", "parent_ref": "...", "name_fr": ..., "source_lang": "fr", "visible": true}
+#   réponse   : {"kind": "response", "category_ref": "...", "type": "text", "answer_fr": ..., "source_lang": "fr"}
+# "id" / "parent_id" / "category_id" désignent des lignes existantes de la base ; "ref" relie les lignes du fichier
+# entre elles (un parent doit apparaître avant ses enfants). Sans id, une ligne existante est retrouvée
+# par son texte source (même règle que seed_data.py), sinon elle est créée.
+# L'export n'écrit pas d'id : importé dans une autre base, il ne doit pas écraser des lignes sans rapport.
+# Les lignes sont traitées par lots : un commit par lot, donc un seul ré-encodage des embeddings par lot
+# (content_events), et les traductions manquantes partent en jobs d'arrière-plan.
+# Un lot refusé par la base est rejoué ligne par ligne : seules les lignes fautives sont rejetées.
+
+IMPORT_BATCH_SIZE = int(os.environ.get("CHATBOT_IMPORT_BATCH_SIZE", 500))
+
+LANGS = ("fr", "en", "ar")
+CSV_COLUMNS = [
+    "kind", "id", "ref", "parent_id", "parent_ref", "category_id", "category_ref", "type",
+    "name_fr", "name_en", "name_ar", "answer_fr", "answer_en", "answer_ar",
+    "file_url", "source_lang", "visible"
+]
+TRANSLATED_TYPES = ("text",)
+
+import_runs = {}
+
+
+# === Lecture ===
+def _clean_record(record):
+    record = {k: (v.strip() if isinstance(v, str) else v) for k, v in record.items() if k}
+    return {k: v for k, v in record.items() if v not in ("", None)}
+
+
+def read_records(stream, fmt="jsonl", on_error=None):
+    # 📖 Lecture en flux : le fichier n'est jamais chargé entièrement en mémoire
+    # on_error(line_no, message) : ligne illisible, ignorée sans interrompre l'import
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, _clean_record(row)
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            if on_error:
+                on_error(line_no, f"JSON invalide : {e}")
+            continue
+        if not isinstance(record, dict):
+            if on_error:
+                on_error(line_no, "objet JSON attendu")
+            continue
+        yield line_no, _clean_record(record)
+
+
+def _as_int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _as_bool(value, default=True):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on", "oui")
+
+
+def _source_lang(record):
+    lang = record.get("source_lang") or "fr"
+    return lang if lang in LANGS else "fr"
+
+
+# === Import ===
+class ContentImporter:
+    def __init__(self, translate=True, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.translate = translate
+        self.batch_size = batch_size
+        self.progress = progress
+        self.refs = {}  # ref du fichier -> id de catégorie en base
+        self.stats = {
+            "processed": 0,
+            "categories_created": 0, "categories_updated": 0,
+            "responses_created": 0, "responses_updated": 0,
+            "translations_scheduled": 0,
+            "errors": []
+        }
+
+    def run(self, records):
+        batch = []
+        for item in records:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._process_batch(batch)
+                batch = []
+        if batch:
+            self._process_batch(batch)
+        return self.stats
+
+    def _error(self, line_no, message):
+        self.stats["errors"].append({"line": line_no, "error": message})
+
+    def _resolve_category(self, record, id_key, ref_key):
+        if record.get(ref_key) is not None:
+            return self.refs.get(str(record[ref_key]))
+        return _as_int(record.get(id_key))
+
+    def _process_batch(self, batch, isolate=True):
+        categories = [(n, r) for n, r in batch if r.get("kind") == "category"]
+        responses = [(n, r) for n, r in batch if r.get("kind") == "response"]
+        for line_no, record in batch:
+            if record.get("kind") not in ("category", "response"):
+                self._error(line_no, f"kind invalide : {record.get('kind')!r}")
+
+        pending = []
+        refs_before = dict(self.refs)
+        stats_before = {k: v for k, v in self.stats.items() if k != "errors"}
+        errors_before = len(self.stats["errors"])
+        try:
+            pending += self._upsert_categories(categories)
+            pending += self._upsert_responses(responses)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.refs = refs_before  # ids créés dans le lot annulé
+            self.stats.update(stats_before)
+            del self.stats["errors"][errors_before:]
+            if isolate and len(categories) + len(responses) > 1:
+                # 🔍 Lot rejeté : rejoué ligne par ligne (catégories d'abord, comme dans le lot),
+                # seule la ligne fautive est refusée, avec son propre message
+                self.stats["processed"] += len(batch) - len(categories) - len(responses)
+                for item in categories + responses:
+                    self._process_batch([item], isolate=False)
+                return
+            for line_no, _ in categories + responses:
+                self._error(line_no, str(e))
+            pending = []
+
+        if pending and self.translate:
+            schedule_translations(pending)
+            self.stats["translations_scheduled"] += len(pending)
+
+        self.stats["processed"] += len(batch)
+        if self.progress:
+            self.progress(dict(self.stats))
+
+    def _upsert_categories(self, categories):
+        if not categories:
+            return []
+
+        # 🔎 Préchargement en deux requêtes des lignes existantes du lot (par id, puis par nom)
+        ids = {_as_int(r["id"]) for _, r in categories if r.get("id")}
+        by_id = {c.id: c for c in Category.query.filter(Category.id.in_(ids))} if ids else {}
+        names = {r.get(f"name_{_source_lang(r)}") for _, r in categories} - {None}
+        by_name = {}
+        if names:
+            existing = Category.query.filter(or_(*[getattr(Category, f"name_{lang}").in_(names) for lang in LANGS]))
+            for c in existing:
+                for lang in LANGS:
+                    by_name.setdefault((lang, getattr(c, f"name_{lang}"), c.parent_id), c)
+
+        touched, pending = [], []
+        for line_no, record in categories:
+            lang = _source_lang(record)
+            name = record.get(f"name_{lang}")
+            if not name:
+                self._error(line_no, f"name_{lang} manquant")
+                continue
+
+            parent_id = self._resolve_category(record, "parent_id", "parent_ref")
+            if record.get("parent_ref") is not None and parent_id is None:
+                self._error(line_no, f"parent_ref inconnu : {record['parent_ref']}")
+                continue
+
+            category = by_id.get(_as_int(record.get("id"))) or by_name.get((lang, name, parent_id))
+            if category is None:
+                category = Category(source_lang=lang)
+                db.session.add(category)
+                self.stats["categories_created"] += 1
+            else:
+                self.stats["categories_updated"] += 1
+
+            missing = [l for l in LANGS if l != lang and not record.get(f"name_{l}")]
+            for l in LANGS:
+                # ⏳ Langues absentes du fichier : texte source en attendant la traduction
+                value = record.get(f"name_{l}") or (getattr(category, f"name_{l}") if category.id else None) or name
+                setattr(category, f"name_{l}", value)
+            category.parent_id = parent_id
+            category.source_lang = lang
+            category.visible = _as_bool(record.get("visible"), category.visible if category.visible is not None else True)
+            by_name[(lang, name, parent_id)] = category
+            touched.append((record, category, lang, name, missing))
+
+            # Les enfants du même lot ont besoin de l'id du parent
+            if record.get("ref") is not None:
+                db.session.flush()
+                self.refs[str(record["ref"])] = category.id
+
+        db.session.flush()
+        for record, category, lang, name, missing in touched:
+            if missing:
+                pending.append(("category", category.id, name, lang, "fr"))
+        return pending
+
+    def _upsert_responses(self, responses):
+        if not responses:
+            return []
+
+        ids = {_as_int(r["id"]) for _, r in responses if r.get("id")}
+        by_id = {r.id: r for r in Response.query.filter(Response.id.in_(ids))} if ids else {}
+
+        resolved = []
+        for line_no, record in responses:
+            category_id = self._resolve_category(record, "category_id", "category_ref")
+            if category_id is None:
+                self._error(line_no, "catégorie introuvable (category_id / category_ref)")
+                continue
+            resolved.append((line_no, record, category_id))
+
+        category_ids = {category_id for _, _, category_id in resolved}
+        by_key = {}
+        if category_ids:
+            for r in Response.query.filter(Response.category_id.in_(category_ids)):
+                by_key.setdefault((r.type, r.category_id, getattr(r, f"answer_{r.source_lang if r.source_lang in LANGS else 'fr'}")), r)
+
+        touched = []
+        for line_no, record, category_id in resolved:
+            response_type = record.get("type") or "text"
+            lang = _source_lang(record)
+            answer = record.get(f"answer_{lang}")
+            if response_type in TRANSLATED_TYPES and not answer:
+                self._error(line_no, f"answer_{lang} manquant")
+                continue
+
+            response = by_id.get(_as_int(record.get("id"))) or by_key.get((response_type, category_id, answer))
+            if response is None:
+                response = Response(type=response_type, category_id=category_id)
+                db.session.add(response)
+                self.stats["responses_created"] += 1
+            else:
+                self.stats["responses_updated"] += 1
+
+            missing = []
+            if response_type in TRANSLATED_TYPES:
+                missing = [l for l in LANGS if l != lang and not record.get(f"answer_{l}")]
+                for l in LANGS:
+                    value = record.get(f"answer_{l}") or (getattr(response, f"answer_{l}") if response.id else None) or answer
+                    setattr(response, f"answer_{l}", value)
+            else:
+                for l in LANGS:
+                    setattr(response, f"answer_{l}", record.get(f"answer_{l}"))
+
+            response.type = response_type
+            response.category_id = category_id
+            response.file_url = record.get("file_url")
+            response.source_lang = lang if response_type != "file" else None
+            by_key[(response_type, category_id, answer)] = response
+            touched.append((response, lang, answer, missing))
+
+        db.session.flush()
+        return [("response", r.id, answer, lang, "fr") for r, lang, answer, missing in touched if missing]
+
+
+def import_file(path, fmt=None, translate=True, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        importer = ContentImporter(translate, batch_size, progress)
+        return importer.run(read_records(f, fmt, importer._error))
+
+
+def start_import(app, path, fmt=None, translate=True):
+    # 🧵 Import lancé depuis l'admin : suivi via import_runs[run_id]
+    run_id = uuid.uuid4().hex
+    run = import_runs[run_id] = {"status": "running", "started_at": datetime.utcnow().isoformat(), "finished_at": None, "stats": None}
+
+    def _progress(stats):
+        run["stats"] = stats
+
+    def _run():
+        with app.app_context():
+            try:
+                run["stats"] = import_file(path, fmt, translate, progress=_progress)
+                run["status"] = "done"
+            except Exception as e:
+                run["status"] = "error"
+                run["error"] = str(e)
+            finally:
+                run["finished_at"] = datetime.utcnow().isoformat()
+                db.session.remove()
+                os.remove(path)
+
+    threading.Thread(target=_run, name=f"content-import-{run_id[:8]}", daemon=True).start()
+    return run_id
+
+
+# === Export ===
+def export_records():
+    # Parents avant enfants, pour que l'import puisse résoudre parent_ref
+    categories = Category.query.order_by(Category.id).all()
+    children = {}
+    for c in categories:
+        children.setdefault(c.parent_id, []).append(c)
+
+    stack = list(reversed(children.get(None, [])))
+    seen = set()
+    while stack:
+        c = stack.pop()
+        seen.add(c.id)
+        yield {
+            "kind": "category", "ref": str(c.id),
+            "parent_ref": str(c.parent_id) if c.parent_id else None,
+            "name_fr": c.name_fr, "name_en": c.name_en, "name_ar": c.name_ar,
+            "source_lang": c.source_lang, "visible": bool(c.visible)
+        }
+        stack.extend(reversed(children.get(c.id, [])))
+
+    # Catégories orphelines (parent supprimé) : exportées sans parent
+    for c in categories:
+        if c.id not in seen:
+            yield {
+                "kind": "category", "ref": str(c.id),
+                "name_fr": c.name_fr, "name_en": c.name_en, "name_ar": c.name_ar,
+                "source_lang": c.source_lang, "visible": bool(c.visible)
+            }
+
+    for r in Response.query.order_by(Response.id).yield_per(IMPORT_BATCH_SIZE):
+        yield {
+            "kind": "response", "category_ref": str(r.category_id), "type": r.type,
+            "answer_fr": r.answer_fr, "answer_en": r.answer_en, "answer_ar": r.answer_ar,
+            "file_url": r.file_url, "source_lang": r.source_lang
+        }
+
+
+def export_lines(fmt="jsonl"):
+    if fmt != "csv":
+        for record in export_records():
+            yield json.dumps({k: v for k, v in record.items() if v is not None}, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for record in export_records():
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# === CLI ===
+# python content_io.py import faq.jsonl [--no-translate] [--batch-size 1000]
+# python content_io.py export faq.csv
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import / export des catégories et réponses")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["jsonl", "csv"])
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--no-translate", action="store_true")
+    args = parser.parse_args()
+
+    # Application minimale (modèles seuls, même base que app.py) : ni encodeur ni autres threads,
+    # seulement le worker de traduction et le suivi des statistiques du tableau de bord
+    from flask import Flask
+    from content_stats import init_stats
+    from translation_jobs import start_translation_worker
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    if args.action == "import":
+        init_stats(app)
+        start_translation_worker(app)
+
+    with app.app_context():
+        fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+        if args.action == "export":
+            with open(args.path, "w", encoding="utf-8", newline="") as f:
+                f.writelines(export_lines(fmt))
+            print(f"✅ Export terminé : {args.path}")
+            sys.exit(0)
+
+        def _print_progress(stats):
+            print(f"⏳ {stats['processed']} lignes traitées "
+                  f"(catégories +{stats['categories_created']}/~{stats['categories_updated']}, "
+                  f"réponses +{stats['responses_created']}/~{stats['responses_updated']}, "
+                  f"erreurs {len(stats['errors'])})")
+
+        stats = import_file(args.path, fmt, not args.no_translate, args.batch_size, _print_progress)
+        for error in stats["errors"][:20]:
+            print(f"❌ Ligne {error['line']} : {error['error']}")
+
+        if stats["translations_scheduled"]:
+            # Le worker de traduction vit dans ce processus : on attend la fin des jobs
+            print(f"🌍 {stats['translations_scheduled']} traductions en cours...")
+            wait_for_jobs()
+        print("✅ Import terminé")
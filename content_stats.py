@@ -0,0 +1,154 @@
+from collections import Counter
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, Category, Response, ContentStat
+
+# === Statistiques du tableau de bord (table content_stat) ===
+# Les compteurs sont calculés une fois par agrégats groupés, puis tenus à jour
+# dans la même transaction que chaque écriture sur Category/Response (after_flush).
+# Le tableau de bord lit donc une petite table de quelques lignes, quelle que soit la taille du corpus.
+# Le compteur "version" augmente à chaque flush qui touche Category/Response : navigation.py
+# s'en sert pour versionner son instantané sans relire le contenu.
+
+RESPONSE_TYPES = ['text', 'file', 'link', 'contact']
+STAT_LANGS = ['fr', 'en', 'ar']
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+_enabled = False
+
+
+def compute_stats():
+    # 🧮 Deux requêtes agrégées au lieu d'un COUNT par compteur
+    counts = Counter({"categories": db.session.query(func.count(Category.id)).scalar() or 0})
+    for response_type, source_lang, count in (
+        db.session.query(Response.type, Response.source_lang, func.count(Response.id))
+        .group_by(Response.type, Response.source_lang)
+    ):
+        counts["responses"] += count
+        counts[f"type:{response_type}"] += count
+        if source_lang:
+            counts[f"lang:{source_lang}"] += count
+    return counts
+
+
+def rebuild_stats():
+    counts = compute_stats()
+    previous = db.session.get(ContentStat, "version")
+    counts["version"] = (previous.value if previous else 0) + 1  # jamais réutilisée après reconstruction
+    ContentStat.query.delete()
+    db.session.add_all([ContentStat(key=key, value=value) for key, value in counts.items()])
+    db.session.commit()
+    return counts
+
+
+def init_stats(app):
+    global _enabled
+    with app.app_context():
+        ContentStat.__table__.create(db.engine, checkfirst=True)
+        if ContentStat.query.first() is None:
+            rebuild_stats()
+        db.session.remove()
+    _enabled = True
+
+
+def get_stats():
+    values = {stat.key: stat.value for stat in ContentStat.query.all()}
+    return {
+        "total_categories": values.get("categories", 0),
+        "total_responses": values.get("responses", 0),
+        "type_counts": {t: values.get(f"type:{t}", 0) for t in RESPONSE_TYPES},
+        "lang_counts": {lang: values.get(f"lang:{lang}", 0) for lang in STAT_LANGS}
+    }
+
+
+# === Mise à jour incrémentale ===
+def _response_keys(values):
+    response_type, source_lang = values
+    keys = ["responses", f"type:{response_type}"]
+    if source_lang:
+        keys.append(f"lang:{source_lang}")
+    return keys
+
+
+def _old_values(obj):
+    state = inspect(obj)
+    values = []
+    for attr in ("type", "source_lang"):
+        history = state.attrs[attr].history
+        values.append(history.deleted[0] if history.deleted else getattr(obj, attr))
+    return tuple(values)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_removed(session, flush_context, instances):
+    # Suppressions / modifications : anciennes valeurs lues avant l'exécution du DELETE/UPDATE
+    if not _enabled:
+        return
+
+    delta = session.info.setdefault("stats_delta", Counter())
+    for obj in session.deleted:
+        if isinstance(obj, Category):
+            delta["categories"] -= 1
+        elif isinstance(obj, Response):
+            delta.subtract(_response_keys(_old_values(obj)))
+
+    for obj in session.dirty:
+        if isinstance(obj, Response):
+            old, new = _old_values(obj), (obj.type, obj.source_lang)
+            if old != new:
+                delta.subtract(_response_keys(old))
+                delta.update(_response_keys(new))
+
+
+@event.listens_for(Session, "after_flush")
+def _write_stats(session, flush_context):
+    if not _enabled:
+        return
+
+    # Créations : après le flush, pour avoir les valeurs par défaut des colonnes (source_lang)
+    delta = session.info.pop("stats_delta", Counter())
+    for obj in session.new:
+        if isinstance(obj, Category):
+            delta["categories"] += 1
+        elif isinstance(obj, Response):
+            delta.update(_response_keys((obj.type, obj.source_lang)))
+
+    delta = {key: value for key, value in delta.items() if value}
+    if any(
+        isinstance(obj, (Category, Response)) and (obj not in session.dirty or session.is_modified(obj, include_collections=False))
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        delta["version"] = 1
+    if not delta:
+        return
+
+    # ✍️ Même connexion, même transaction que l'écriture : annulé avec elle en cas de rollback
+    connection = session.connection()
+    table = ContentStat.__table__
+    insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    for key, value in delta.items():
+        if insert is not None:
+            # 🔒 Upsert atomique : deux écritures concurrentes sur un compteur absent ne se heurtent pas
+            # à la clé primaire (qui annulerait la modification admin)
+            statement = insert(table).values(key=key, value=value)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.key], set_={"value": table.c.value + statement.excluded.value}
+            ))
+            continue
+        updated = connection.execute(
+            table.update().where(table.c.key == key).values(value=table.c.value + value)
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(key=key, value=value))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stats(session):
+    session.info.pop("stats_delta", None)
+
+
+# Ancienne valeur de type/source_lang chargée avant modification, même si l'attribut était expiré
+for _attr in (Response.type, Response.source_lang):
+    event.listen(_attr, "set", lambda target, value, oldvalue, initiator: value, active_history=True, retval=True)
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# === État des conversations côté serveur ===
+# Le cookie de session ne contient plus qu'un identifiant de conversation ; la dernière réponse
+# est mémorisée ici sous forme de référence ({"kind", "response_id"}), jamais de texte.
+# Mémoire : LRU avec expiration. Persistance SQLite optionnelle (CHATBOT_CONVERSATION_DB)
+# pour partager l'état entre processus et le garder après un redémarrage.
+
+CONVERSATION_CACHE_SIZE = int(os.environ.get("CHATBOT_CONVERSATION_CACHE_SIZE", 10000))
+CONVERSATION_TTL = float(os.environ.get("CHATBOT_CONVERSATION_TTL", 3600))
+CONVERSATION_DB_PATH = os.environ.get("CHATBOT_CONVERSATION_DB", "")
+PURGE_EVERY = 1000  # écritures SQLite entre deux purges des conversations expirées
+
+
+class ConversationStore:
+    def __init__(self, maxsize=CONVERSATION_CACHE_SIZE, ttl=CONVERSATION_TTL, db_path=CONVERSATION_DB_PATH):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+    # --- Persistance SQLite (optionnelle) ---
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    conversation_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    response_id INTEGER,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+        return self._db
+
+    def _db_get(self, conversation_id):
+        try:
+            with self._db_lock:
+                row = self._conn().execute(
+                    "SELECT kind, response_id, updated_at FROM conversation_state WHERE conversation_id = ?",
+                    (conversation_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print("⚠️ Stockage des conversations indisponible :", e)
+            return None
+        if row is None or row[2] + self.ttl < time.time():
+            return None
+        return {"kind": row[0], "response_id": row[1]}
+
+    def _db_put(self, conversation_id, state):
+        try:
+            with self._db_lock:
+                db = self._conn()
+                db.execute(
+                    "INSERT OR REPLACE INTO conversation_state (conversation_id, kind, response_id, updated_at) VALUES (?, ?, ?, ?)",
+                    (conversation_id, state["kind"], state["response_id"], time.time())
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print("⚠️ Stockage des conversations indisponible :", e)
+
+    def purge_expired(self):
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                db = self._conn()
+                db.execute("DELETE FROM conversation_state WHERE updated_at < ?", (time.time() - self.ttl,))
+                db.commit()
+        except sqlite3.Error as e:
+            print("⚠️ Stockage des conversations indisponible :", e)
+
+    # --- Accès ---
+    def get(self, conversation_id):
+        if not conversation_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                if entry[0] >= time.monotonic():
+                    self._entries.move_to_end(conversation_id)
+                    return entry[1]
+                del self._entries[conversation_id]
+
+        state = self._db_get(conversation_id) if self.db_path else None
+        if state is not None:
+            self._remember(conversation_id, state)
+        return state
+
+    def put(self, conversation_id, state):
+        self._remember(conversation_id, state)
+        if self.db_path:
+            self._db_put(conversation_id, state)
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.purge_expired()
+
+    def _remember(self, conversation_id, state):
+        with self._lock:
+            self._entries[conversation_id] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+conversations = ConversationStore()
+
+
+def conversation_id(session, create=False):
+    # 🍪 Seul cet identifiant est stocké dans le cookie ; le cookie n'est donc réécrit qu'une fois
+    cid = session.get("conversation_id")
+    if cid is None and create:
+        cid = session["conversation_id"] = uuid.uuid4().hex
+    return cid
+
+
+def remember_last_answer(session, kind, response_id=None):
+    conversations.put(conversation_id(session, create=True), {"kind": kind, "response_id": response_id})
+
+
+def last_answer(session):
+    return conversations.get(conversation_id(session))
@@ -0,0 +1,59 @@
+import os
+from models import Category, Response, StoredFile
+from file_store import STORED_NAME_RE
+
+# === Contenu des pièces jointes pour la recherche ===
+# Le texte extrait en arrière-plan (stored_file.text_content, cf. file_processing) est découpé
+# en passages de DOC_CHUNK_WORDS mots qui se chevauchent ; chaque passage garde l'id de la
+# réponse "file" qui référence le document. text_api encode ces passages et les indexe par langue.
+
+DOC_CHUNK_WORDS = int(os.environ.get("CHATBOT_DOC_CHUNK_WORDS", 120))
+DOC_CHUNK_OVERLAP = int(os.environ.get("CHATBOT_DOC_CHUNK_OVERLAP", 30))
+DOC_MAX_CHUNKS = int(os.environ.get("CHATBOT_DOC_MAX_CHUNKS", 200))  # par document
+
+
+def stored_digest(file_url):
+    match = STORED_NAME_RE.match(os.path.basename((file_url or "").replace("\\", "/")))
+    return match.group(1) if match else None
+
+
+def document_texts(s, response_ids=None):
+    # {response_id: texte} pour les réponses "file" visibles dont le texte a été extrait
+    query = (
+        s.query(Response.id, Response.file_url)
+        .join(Response.category)
+        .filter(Category.visible == True, Response.type == 'file', Response.file_url.isnot(None))
+    )
+    if response_ids is not None:
+        query = query.filter(Response.id.in_(list(response_ids)))
+
+    digests = {response_id: stored_digest(file_url) for response_id, file_url in query}
+    digests = {response_id: digest for response_id, digest in digests.items() if digest}
+    if not digests:
+        return {}
+
+    texts = dict(
+        s.query(StoredFile.digest, StoredFile.text_content)
+        .filter(StoredFile.digest.in_(set(digests.values())), StoredFile.text_content.isnot(None))
+    )
+    return {response_id: texts[digest] for response_id, digest in digests.items() if digest in texts}
+
+
+def chunk_text(text):
+    words = text.split()
+    step = max(1, DOC_CHUNK_WORDS - DOC_CHUNK_OVERLAP)
+    chunks = []
+    for start in range(0, max(1, len(words) - DOC_CHUNK_OVERLAP), step):
+        chunks.append(" ".join(words[start:start + DOC_CHUNK_WORDS]))
+        if len(chunks) >= DOC_MAX_CHUNKS:
+            break
+    return [chunk for chunk in chunks if chunk]
+
+
+def document_chunks(texts):
+    # [{"response_id", "text"}] dans l'ordre des réponses
+    return [
+        {"response_id": response_id, "text": chunk}
+        for response_id, text in sorted(texts.items())
+        for chunk in chunk_text(text)
+    ]
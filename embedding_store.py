@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+# === Cache disque des embeddings ===
+# Une matrice brute (float32/float16) mappée en mémoire + un index { clé -> ligne }.
+# La clé combine modèle + fonction de nettoyage + texte,
+# ce qui permet de ne ré-encoder au démarrage que les textes nouveaux ou modifiés.
+# L'index est un journal en ajout seul ("clé ligne" par ligne) : un ajout n'écrit que ses entrées.
+# Lecture : des lignes contiguës en float32 sont renvoyées comme vue sur la projection mémoire
+# (copie à l'écriture : pages partagées entre workers) ; sinon une seule copie, gardée par le cache de text_api.
+# compact() réécrit le magasin avec les seules clés utilisées, dans l'ordre des demandes : au démarrage
+# suivant, chaque lot du préchargement retombe sur des lignes contiguës. Le fichier "current" désigne
+# la génération en service (vectors/index), remplacée atomiquement.
+
+STORE_DIR = os.environ.get("CHATBOT_EMBEDDING_STORE", os.path.join("instance", "embeddings"))
+STORE_DTYPE = os.environ.get("CHATBOT_EMBEDDING_DTYPE", "float32")
+COMPACT_CHUNK_ROWS = 4096
+
+
+def text_key(model_name, cleaner, text):
+    return hashlib.sha1(f"{model_name}\0{cleaner}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, model_name, dim, directory=STORE_DIR, dtype=STORE_DTYPE):
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.directory = directory
+        self.current_path = os.path.join(directory, f"current.{self.dtype.name}")
+        self.legacy_index_path = os.path.join(directory, f"index.{self.dtype.name}.json")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._used = {}  # clés demandées par ce processus, dans l'ordre (pour compact)
+        self._matrix = None
+        self._generation = 0
+
+        os.makedirs(directory, exist_ok=True)
+        handle = self._file_lock()
+        try:
+            self._reload()
+        finally:
+            handle.close()
+
+    def _vectors_path(self, generation):
+        suffix = f".{generation}" if generation else ""  # génération 0 : noms historiques
+        return os.path.join(self.directory, f"vectors.{self.dtype.name}{suffix}")
+
+    def _log_path(self, generation):
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.directory, f"index.{self.dtype.name}{suffix}.log")
+
+    def _read_generation(self):
+        try:
+            with open(self.current_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _read_log(self, generation):
+        keys = {}
+        if generation == 0 and os.path.exists(self.legacy_index_path):
+            # Ancien index JSON (réécrit en entier à chaque ajout) : relu, les ajouts vont au journal
+            try:
+                with open(self.legacy_index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("dim") == self.dim:
+                    keys = data.get("keys", {})
+            except (OSError, ValueError):
+                keys = {}
+
+        path = self._log_path(generation)
+        if not os.path.exists(path):
+            return keys
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.readline().split()
+            if header[:2] != ["dim", str(self.dim)]:
+                return {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit() and line.endswith("\n"):
+                    keys[parts[0]] = int(parts[1])  # ligne tronquée (arrêt brutal) ignorée
+        return keys
+
+    def _map(self, path, n_rows):
+        # "c" : copie à l'écriture, les pages lues restent partagées avec les autres processus
+        return np.memmap(path, dtype=self.dtype, mode="c", shape=(n_rows, self.dim)) if n_rows else None
+
+    # 🔁 Relit l'index et remappe la matrice (un autre worker a pu écrire ou compacter)
+    def _reload(self):
+        generation = self._read_generation()
+        keys = self._read_log(generation)
+
+        vectors_path = self._vectors_path(generation)
+        row_bytes = self.dim * self.dtype.itemsize
+        n_rows = os.path.getsize(vectors_path) // row_bytes if os.path.exists(vectors_path) else 0
+
+        # ⚠️ Index incohérent avec la matrice : on ignore les lignes manquantes
+        keys = {k: row for k, row in keys.items() if row < n_rows}
+
+        self._generation = generation
+        self._keys = keys
+        self._matrix = self._map(vectors_path, n_rows)
+
+    def _append_log(self, entries):
+        path = self._log_path(self._generation)
+        with open(path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write(f"dim {self.dim} {self.model_name}\n")
+            f.writelines(f"{k} {row}\n" for k, row in entries)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _file_lock(self):
+        handle = open(self.lock_path, "a")
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_or_encode(self, texts, encode_fn, cleaner="raw"):
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        keys = [text_key(self.model_name, cleaner, t) for t in texts]
+
+        with self._lock:
+            missing = {k: t for k, t in zip(keys, texts) if k not in self._keys}
+            if missing:
+                self._append(missing, encode_fn)
+            self._used.update(dict.fromkeys(keys))
+
+            rows = np.fromiter((self._keys[k] for k in keys), dtype=np.int64, count=len(keys))
+            if self.dtype == np.float32 and rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+                return self._matrix[rows[0]:rows[-1] + 1]  # vue : aucune copie
+            return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def _append(self, missing, encode_fn):
+        handle = self._file_lock()
+        try:
+            self._reload()
+            missing = {k: t for k, t in missing.items() if k not in self._keys}
+            if not missing:
+                return
+
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype=self.dtype).reshape(-1, self.dim)
+            start = self._matrix.shape[0] if self._matrix is not None else 0
+            vectors_path = self._vectors_path(self._generation)
+
+            # ✂️ Écrit juste après la dernière ligne complète (écrase une éventuelle ligne tronquée)
+            with open(vectors_path, "r+b" if os.path.exists(vectors_path) else "wb") as f:
+                f.seek(start * self.dim * self.dtype.itemsize)
+                f.write(vectors.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Journal écrit après les vecteurs : une entrée pointe toujours vers une ligne complète
+            entries = [(k, start + i) for i, k in enumerate(missing)]
+            self._append_log(entries)
+            self._keys.update(entries)
+
+            self._matrix = self._map(vectors_path, start + len(missing))
+        finally:
+            handle.close()
+
+    def compact(self, keep=None):
+        # 🧹 Nouvelle génération avec les seules clés `keep` (par défaut : celles demandées par ce processus)
+        with self._lock:
+            handle = self._file_lock()
+            try:
+                self._reload()
+                keep = [k for k in (self._used if keep is None else dict.fromkeys(keep)) if k in self._keys]
+                if [self._keys[k] for k in keep] == list(range(len(self._keys))):
+                    return 0  # déjà compact et dans l'ordre
+
+                generation = self._generation + 1
+                vectors_path, log_path = self._vectors_path(generation), self._log_path(generation)
+                rows = np.fromiter((self._keys[k] for k in keep), dtype=np.int64, count=len(keep))
+                with open(vectors_path, "wb") as f:
+                    for i in range(0, len(rows), COMPACT_CHUNK_ROWS):
+                        f.write(np.ascontiguousarray(self._matrix[rows[i:i + COMPACT_CHUNK_ROWS]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(log_path, "w", encoding="utf-8") as f:
+                    f.write(f"dim {self.dim} {self.model_name}\n")
+                    f.writelines(f"{k} {row}\n" for row, k in enumerate(keep))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                tmp_path = f"{self.current_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(str(generation))
+                os.replace(tmp_path, self.current_path)
+
+                removed = len(self._keys) - len(keep)
+                previous = self._generation
+                self._reload()
+
+                # Ancienne génération : les processus qui la projettent encore gardent leurs pages
+                for path in (self._vectors_path(previous), self._log_path(previous), self.legacy_index_path if previous == 0 else None):
+                    if path and os.path.exists(path):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                return removed
+            finally:
+                handle.close()
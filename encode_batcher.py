@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# === Regroupement des encodages de questions (micro-batching) ===
+# Les requêtes concurrentes (/api/ask, /api/start) déposent leurs phrases dans une file ;
+# un thread unique les encode par lots (fenêtre de quelques ms ou N phrases max)
+# puis renvoie à chaque appelant sa part du résultat.
+# Fenêtre adaptative : une requête isolée (file vide, lot précédent seul) part tout de suite ;
+# la fenêtre n'est attendue qu'en charge, quand le lot précédent regroupait déjà plusieurs requêtes.
+# Les requêtes arrivées pendant un encodage sont de toute façon regroupées dans le lot suivant.
+
+BATCH_WAIT_MS = float(os.environ.get("CHATBOT_BATCH_WAIT_MS", 3))
+BATCH_MAX_SIZE = int(os.environ.get("CHATBOT_BATCH_MAX_SIZE", 32))
+
+
+class EncodeBatcher:
+    def __init__(self, encode_fn, max_wait_ms=BATCH_WAIT_MS, max_batch_size=BATCH_MAX_SIZE):
+        self.encode_fn = encode_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._busy = False  # le dernier lot regroupait plusieurs requêtes
+
+    def encode(self, texts):
+        # ⏩ Fenêtre nulle : pas de regroupement, appel direct
+        if self.max_wait <= 0:
+            return self.encode_fn(texts)
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                # ⚡ Déjà en file : pris sans attendre ; sinon fenêtre seulement en charge
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if not self._busy or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            size += len(item[0])
+        self._busy = len(batch) > 1
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            try:
+                embeddings = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+from sentence_transformers import SentenceTransformer
+
+# === Choix du moteur d'inférence de l'encodeur ===
+# CHATBOT_ENCODER_BACKEND :
+#   "torch"     -> PyTorch pleine précision (par défaut)
+#   "onnx"      -> export ONNX exécuté par onnxruntime sur CPU
+#   "onnx-int8" -> export ONNX quantifié int8 (quantification dynamique)
+# Les backends ONNX nécessitent : pip install "sentence-transformers[onnx]"
+# L'export est fait une seule fois, dans un dossier voisin du modèle (<modèle>-onnx).
+
+ENCODER_BACKEND = os.environ.get("CHATBOT_ENCODER_BACKEND", "torch")
+QUANTIZED_FILE_NAME = "onnx/model_qint8.onnx"
+
+
+def onnx_dir(model_path):
+    return f"{model_path.rstrip('/')}-onnx"
+
+
+def encoder_key(model_path, backend=ENCODER_BACKEND):
+    # 🔑 Les embeddings ONNX/int8 diffèrent légèrement : clé de cache distincte
+    name = Path(model_path).name
+    return name if backend == "torch" else f"{name}+{backend}"
+
+
+def _export_onnx(model_path):
+    target = onnx_dir(model_path)
+    if not os.path.exists(os.path.join(target, "onnx", "model.onnx")):
+        print(f"📦 Export ONNX de {model_path} vers {target}...")
+        model = SentenceTransformer(model_path, backend="onnx", device="cpu")
+        model.save_pretrained(target)
+    return target
+
+
+def _load_onnx(model_path, quantized):
+    target = _export_onnx(model_path)
+    if not quantized:
+        return SentenceTransformer(target, backend="onnx", device="cpu")
+
+    quantized_path = os.path.join(target, QUANTIZED_FILE_NAME)
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"📦 Quantification int8 de {target}...")
+        quantize_dynamic(os.path.join(target, "onnx", "model.onnx"), quantized_path, weight_type=QuantType.QInt8)
+
+    return SentenceTransformer(target, backend="onnx", device="cpu", model_kwargs={"file_name": QUANTIZED_FILE_NAME})
+
+
+def load_encoder(model_path, backend=ENCODER_BACKEND):
+    if backend in ("onnx", "onnx-int8"):
+        try:
+            return _load_onnx(model_path, quantized=backend == "onnx-int8"), backend
+        except Exception as e:
+            # ⚠️ onnxruntime/optimum absents ou export impossible : on reste sur PyTorch
+            print(f"❌ Backend {backend} indisponible, retour à PyTorch :", e)
+    return SentenceTransformer(model_path), "torch"
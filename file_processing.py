@@ -0,0 +1,165 @@
+import os
+import queue
+import re
+import threading
+import time
+import zipfile
+from xml.etree import ElementTree
+from models import db, Response, StoredFile
+from content_events import publish_changes
+from file_store import UPLOAD_DIR, THUMBNAIL_DIR, thumbnail_path, sweep_orphans
+
+# === Post-traitement des pièces jointes en arrière-plan ===
+# Après l'envoi, la requête se contente d'enregistrer le fichier ; un thread dédié calcule ensuite :
+#   - une miniature JPEG pour les images (uploads/thumbs/<digest>.jpg)
+#   - le texte des PDF / DOCX / TXT (stored_file.text_content), pour l'indexation de recherche
+# L'état est persisté dans stored_file.status : les fichiers "pending" sont repris au redémarrage.
+# Une fois le texte extrait, les réponses qui référencent le fichier sont signalées à content_events :
+# text_api (ré)indexe alors leurs passages (cf. document_chunks).
+# Le même thread lance périodiquement le ramasse-miettes des fichiers orphelins (file_store.sweep_orphans).
+# Miniatures : Pillow ; PDF : pypdf (pip install pypdf). Sans ces paquets, l'étape est ignorée.
+
+FILE_GC_INTERVAL = float(os.environ.get("CHATBOT_FILE_GC_INTERVAL", 6 * 3600))
+THUMBNAIL_SIZE = (320, 320)
+MAX_TEXT_LENGTH = 1_000_000
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+TEXT_EXTENSIONS = {".txt", ".md", ".csv"}
+DOCX_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+# --- Étapes ---
+def make_thumbnail(stored, path):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    os.makedirs(os.path.join(UPLOAD_DIR, THUMBNAIL_DIR), exist_ok=True)
+    target = thumbnail_path(stored.digest)
+    tmp_path = target + ".tmp"
+    with Image.open(path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.convert("RGB").save(tmp_path, "JPEG", quality=85)
+    os.replace(tmp_path, target)
+    return os.path.basename(target)
+
+
+def _pdf_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def _docx_text(path):
+    # DOCX = archive zip ; le texte est dans les balises <w:t> de word/document.xml, par paragraphe <w:p>
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    return "\n".join(
+        "".join(node.text or "" for node in paragraph.iter(DOCX_NAMESPACE + "t"))
+        for paragraph in root.iter(DOCX_NAMESPACE + "p")
+    )
+
+
+def _plain_text(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read(MAX_TEXT_LENGTH)
+
+
+def extract_text(stored, path):
+    extractors = {".pdf": _pdf_text, ".docx": _docx_text}
+    extractor = extractors.get(stored.extension) or (_plain_text if stored.extension in TEXT_EXTENSIONS else None)
+    if extractor is None:
+        return None
+    text = extractor(path)
+    if text is None:
+        return None
+    text = re.sub(r"[ \t]+", " ", re.sub(r"\n\s*\n+", "\n\n", text)).strip()
+    return text[:MAX_TEXT_LENGTH] or None
+
+
+def process_file(digest):
+    stored = db.session.get(StoredFile, digest)
+    if stored is None or stored.status != "pending":
+        return None
+
+    path = os.path.join(UPLOAD_DIR, stored.filename)
+    try:
+        if stored.extension in IMAGE_EXTENSIONS:
+            stored.thumbnail = make_thumbnail(stored, path)
+        stored.text_content = extract_text(stored, path)
+        stored.status, stored.error = "done", None
+    except Exception as e:
+        stored.status, stored.error = "error", str(e)[:1000]
+        print(f"❌ Post-traitement de {stored.filename} en erreur :", e)
+    db.session.commit()
+
+    if stored.text_content:
+        response_ids = [rid for (rid,) in db.session.query(Response.id).filter(Response.file_url.like(f"%{stored.filename}"))]
+        if response_ids:
+            publish_changes([{"kind": "response", "id": rid, "op": "upsert"} for rid in response_ids])
+    return stored
+
+
+# --- File d'attente ---
+def schedule_processing(digests):
+    # À appeler après le commit qui enregistre les lignes stored_file
+    for digest in digests:
+        if _worker is None:
+            process_file(digest)
+        else:
+            _queue.put(digest)
+
+
+def _run(app):
+    next_sweep = time.monotonic() + FILE_GC_INTERVAL
+    with app.app_context():
+        while True:
+            try:
+                digest = _queue.get(timeout=max(0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                digest = None
+
+            try:
+                if digest is not None:
+                    process_file(digest)
+                if time.monotonic() >= next_sweep:
+                    removed = sweep_orphans()
+                    if removed:
+                        print(f"🧹 {removed} fichier(s) orphelin(s) supprimé(s)")
+                    next_sweep = time.monotonic() + FILE_GC_INTERVAL
+            except Exception as e:
+                db.session.rollback()
+                print("❌ Traitement des pièces jointes en erreur :", e)
+            finally:
+                db.session.remove()
+                if digest is not None:
+                    _queue.task_done()
+
+
+def wait_for_files():
+    if _worker is not None:
+        _queue.join()
+
+
+def start_file_worker(app):
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            return _worker
+
+        with app.app_context():
+            # 🔄 Reprise après redémarrage (y compris les fichiers repris par migrate_legacy_uploads)
+            for (digest,) in db.session.query(StoredFile.digest).filter_by(status="pending"):
+                _queue.put(digest)
+            db.session.remove()
+
+        _worker = threading.Thread(target=_run, args=(app,), name="file-processing", daemon=True)
+        _worker.start()
+    return _worker
@@ -0,0 +1,257 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import current_app, send_file, send_from_directory, abort, request
+from werkzeug.utils import secure_filename
+from models import db, Response, StoredFile
+
+# === Stockage et diffusion des pièces jointes ===
+# Chaque fichier est enregistré sous le hash de son contenu (uploads/<sha256><ext>) :
+# deux envois identiques partagent le même fichier, et une URL ne change jamais de contenu.
+# La diffusion peut donc utiliser un ETag fort (le hash) et un cache navigateur/CDN d'un an.
+# Les requêtes Range (PDF volumineux) et If-None-Match sont gérées par send_file,
+# qui transmet le fichier via wsgi.file_wrapper sans le relire en Python.
+# Optionnel : délégation de l'envoi au proxy frontal (CHATBOT_FILE_OFFLOAD) :
+#   "sendfile" -> en-tête X-Sendfile (Apache mod_xsendfile, lighttpd)
+#   "accel"    -> en-tête X-Accel-Redirect vers FILE_ACCEL_PREFIX (nginx, location internal)
+# Taille limitée à MAX_UPLOAD_SIZE ; les fichiers qui ne sont plus référencés par aucune réponse
+# (remplacés, supprimés, envois interrompus) sont effacés par sweep_orphans après un délai de grâce.
+
+UPLOAD_DIR = os.environ.get("CHATBOT_UPLOAD_DIR", "uploads")
+FILE_OFFLOAD = os.environ.get("CHATBOT_FILE_OFFLOAD", "")
+FILE_ACCEL_PREFIX = os.environ.get("CHATBOT_FILE_ACCEL_PREFIX", "/_protected_uploads/")
+FILE_MAX_AGE = 365 * 24 * 3600
+LEGACY_FILE_MAX_AGE = int(os.environ.get("CHATBOT_LEGACY_FILE_MAX_AGE", 3600))
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = int(float(os.environ.get("CHATBOT_MAX_UPLOAD_MB", 25)) * 1024 * 1024)
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # champs texte du formulaire envoyés avec le fichier
+FILE_GC_GRACE = float(os.environ.get("CHATBOT_FILE_GC_GRACE", 3600))
+THUMBNAIL_DIR = "thumbs"
+
+STORED_EXTENSION_RE = re.compile(r"^\.[0-9a-z]{1,10}$")
+STORED_NAME_RE = re.compile(r"^([0-9a-f]{64})(\.[0-9a-z]{1,10})?$")
+THUMBNAIL_NAME_RE = re.compile(r"^thumbs/([0-9a-f]{64})\.jpg$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def limit_upload_request(request):
+    # 🚧 À appeler avant de lire request.form / request.files : Werkzeug coupe le flux au-delà (413)
+    request.max_content_length = MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD
+
+
+def file_url(stored):
+    # Même forme qu'avant (uploads/<nom>) : les clients qui prennent le nom final restent compatibles
+    return f"uploads/{stored.filename}"
+
+
+def _extension(filename):
+    # Uniquement ce qu'accepte STORED_NAME_RE, sinon pas d'extension : un nom stocké doit toujours
+    # être reconnu (ETag fort, referenced_digests, ramasse-miettes)
+    extension = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return extension if STORED_EXTENSION_RE.match(extension) else ""
+
+
+def thumbnail_path(digest):
+    return os.path.join(UPLOAD_DIR, THUMBNAIL_DIR, digest + ".jpg")
+
+
+def store_stream(stream, original_name, max_size=MAX_UPLOAD_SIZE):
+    # 🔐 Écriture par blocs dans un fichier temporaire, hash et taille calculés au passage,
+    # puis déplacement atomique : un fichier final n'est jamais partiellement écrit
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    sha, size = hashlib.sha256(), 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(original_name)
+                sha.update(chunk)
+                f.write(chunk)
+
+        digest = sha.hexdigest()
+        # ♻️ Contenu déjà connu : on garde son nom (et son extension), même envoyé sous un autre nom
+        stored = db.session.get(StoredFile, digest)
+        extension = stored.extension if stored is not None else _extension(original_name)
+        path = os.path.join(UPLOAD_DIR, digest + extension)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # pas de second exemplaire
+            os.utime(path)  # repousse le ramasse-miettes (délai de grâce)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if stored is None:
+        stored = StoredFile(
+            digest=digest,
+            extension=extension,
+            size=size,
+            mime_type=mimetypes.guess_type(original_name or "")[0],
+            original_name=secure_filename(original_name or "") or None
+        )
+        db.session.add(stored)
+    return stored
+
+
+def store_upload(uploaded):
+    # Ajouté à la session : enregistré par le commit de l'appelant
+    return store_stream(uploaded.stream, uploaded.filename)
+
+
+def _offload(stored, download_name):
+    response = current_app.response_class(mimetype=stored.mime_type or "application/octet-stream")
+    response.headers["X-Accel-Redirect"] = FILE_ACCEL_PREFIX + stored.filename
+    response.headers["Content-Disposition"] = f"inline; filename=\"{download_name}\""
+    response.set_etag(stored.digest)
+    return response
+
+
+def send_thumbnail(digest):
+    path = os.path.abspath(thumbnail_path(digest))
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype="image/jpeg", etag=digest + "-thumb", conditional=True, max_age=FILE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def send_stored_file(filename):
+    thumbnail = THUMBNAIL_NAME_RE.match(filename)
+    if thumbnail is not None:
+        return send_thumbnail(thumbnail.group(1))
+
+    match = STORED_NAME_RE.match(filename)
+    if match is None:
+        # 🗂️ Anciens fichiers (nom d'origine) : cache court, ETag calculé par Flask
+        return send_from_directory(os.path.abspath(UPLOAD_DIR), filename, max_age=LEGACY_FILE_MAX_AGE)
+
+    path = os.path.abspath(os.path.join(UPLOAD_DIR, filename))
+    if not os.path.isfile(path):
+        abort(404)
+
+    stored = db.session.get(StoredFile, match.group(1))
+    download_name = (stored.original_name if stored else None) or filename
+
+    if FILE_OFFLOAD == "accel" and stored is not None:
+        response = _offload(stored, download_name)
+        response = response.make_conditional(request)
+    else:
+        response = send_file(
+            path,
+            mimetype=stored.mime_type if stored else None,
+            download_name=download_name,
+            etag=match.group(1),
+            conditional=True,
+            max_age=FILE_MAX_AGE
+        )
+    response.cache_control.public = True
+    response.cache_control.max_age = FILE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def referenced_digests():
+    digests = set()
+    for (url,) in db.session.query(Response.file_url).filter(Response.file_url.isnot(None)):
+        match = STORED_NAME_RE.match(os.path.basename(url.replace("\\", "/")))
+        if match:
+            digests.add(match.group(1))
+    return digests
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def sweep_orphans(grace=FILE_GC_GRACE):
+    # 🧹 Fichiers (et miniatures) qu'aucune réponse ne référence, non touchés depuis `grace` secondes.
+    # Le délai protège les envois en cours : fichier déjà déplacé, réponse pas encore validée.
+    referenced = referenced_digests()
+    cutoff = time.time() - grace
+    removed = 0
+
+    for stored in StoredFile.query.filter(StoredFile.created_at < datetime.utcnow() - timedelta(seconds=grace)):
+        if stored.digest in referenced:
+            continue
+        path = os.path.join(UPLOAD_DIR, stored.filename)
+        if os.path.exists(path) and os.path.getmtime(path) >= cutoff:
+            continue  # renvoyé récemment (déduplication)
+        removed += _remove(path)
+        _remove(thumbnail_path(stored.digest))
+        db.session.delete(stored)
+    db.session.commit()
+
+    # Restes sans ligne en base : envois interrompus, fichiers dont la transaction a été annulée,
+    # ainsi que les copies d'un contenu connu sous une autre extension que celle de sa ligne
+    known = {digest: digest + extension for digest, extension in db.session.query(StoredFile.digest, StoredFile.extension)}
+    for directory in (UPLOAD_DIR, os.path.join(UPLOAD_DIR, THUMBNAIL_DIR)):
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                continue
+            match = STORED_NAME_RE.match(entry.name)
+            digest = match.group(1) if match else None
+            stray = directory == UPLOAD_DIR and digest in known and entry.name != known[digest]
+            if entry.name.startswith(".upload-") or stray or (match and digest not in known and digest not in referenced):
+                removed += _remove(entry.path)
+    return removed
+
+
+def _fix_stored_extensions():
+    # Fichiers enregistrés avant la normalisation des extensions (ex. ".tar-gz") : renommés sans extension
+    fixed = 0
+    for stored in StoredFile.query.filter(StoredFile.extension != "").all():
+        if STORED_EXTENSION_RE.match(stored.extension):
+            continue
+        old_url, old_path = file_url(stored), os.path.join(UPLOAD_DIR, stored.filename)
+        stored.extension = ""
+        if os.path.isfile(old_path):
+            os.replace(old_path, os.path.join(UPLOAD_DIR, stored.filename))
+        Response.query.filter_by(file_url=old_url).update({"file_url": file_url(stored)}, synchronize_session=False)
+        fixed += 1
+    return fixed
+
+
+def migrate_legacy_uploads():
+    # 🔄 Réponses qui pointent encore vers un fichier nommé d'après l'envoi d'origine
+    migrated = _fix_stored_extensions()
+    for response in Response.query.filter(Response.file_url.isnot(None)).all():
+        name = os.path.basename(response.file_url.replace("\\", "/"))
+        path = os.path.join(UPLOAD_DIR, name)
+        if STORED_NAME_RE.match(name) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            stored = store_stream(f, name)
+        response.file_url = file_url(stored)
+        migrated += 1
+    db.session.commit()
+    return migrated
+
+
+def init_file_store(app):
+    if FILE_OFFLOAD == "sendfile":
+        app.config["USE_X_SENDFILE"] = True
+
+    with app.app_context():
+        StoredFile.__table__.create(db.engine, checkfirst=True)
+        migrated = migrate_legacy_uploads()
+        if migrated:
+            print(f"🗂️ {migrated} pièce(s) jointe(s) déplacée(s) vers le stockage par hash")
+        db.session.remove()
@@ -0,0 +1,118 @@
+import json
+import math
+import os
+import re
+import unicodedata
+from functools import lru_cache
+import langdetect
+
+# === Identification de langue restreinte à fr / en / ar ===
+# 1. Écriture : une majorité de lettres arabes -> "ar" (aucun modèle nécessaire).
+# 2. fr vs en : Bayes naïf sur les n-grammes de caractères (1 à 3) des profils fr/en
+#    livrés avec langdetect, sans échantillonnage aléatoire : même texte -> même résultat.
+# 3. Messages très courts (1 à 3 mots : "merci", "svp", "thanks") : trop peu de n-grammes pour le modèle,
+#    un lexique de formules courantes décide ; les mots neutres ("ok") renvoient la langue par défaut.
+# 4. Les textes courts (questions, relances) sont mémorisés dans un cache LRU.
+
+LANG_ID_MEMO_SIZE = int(os.environ.get("CHATBOT_LANG_ID_MEMO_SIZE", 4096))
+LANG_ID_MEMO_MAX_LEN = 200
+UNSEEN_RATIO = 0.5
+SHORT_TEXT_WORDS = 3
+
+SHORT_LEXICON = {
+    "fr": {"bonjour", "bonsoir", "salut", "coucou", "merci", "beaucoup", "svp", "stp", "aide", "oui", "non",
+           "daccord", "accord", "revoir", "au", "bonne", "journee", "soiree", "parfait", "bien"},
+    "en": {"hello", "hi", "hey", "please", "help", "thanks", "thank", "you", "yes", "no", "bye", "goodbye",
+           "good", "morning", "evening", "great", "fine"},
+}
+NEUTRAL_WORDS = {"ok", "okay", "oki", "cool", "super", "top"}
+
+ARABIC_RE = re.compile(r"[؀-ۿݐ-ݿࢠ-ࣿﭐ-﷿ﹰ-﻿]")
+LATIN_RE = re.compile(r"[a-zA-ZÀ-ɏ]")
+
+
+def _load_profile(lang):
+    path = os.path.join(os.path.dirname(langdetect.__file__), "profiles", lang)
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+
+    freq = {}
+    for gram, count in profile["freq"].items():
+        gram = gram.lower()
+        freq[gram] = freq.get(gram, 0) + count
+
+    # Profils élagués : un n-gramme absent est au plus aussi fréquent que le moins fréquent gardé
+    model = {}
+    for n in (1, 2, 3):
+        grams = {gram: count for gram, count in freq.items() if len(gram) == n}
+        total = profile["n_words"][n - 1]
+        model[n] = ({gram: math.log(count / total) for gram, count in grams.items()},
+                    math.log(UNSEEN_RATIO * min(grams.values()) / total))
+    return model
+
+
+_PROFILES = {lang: _load_profile(lang) for lang in ("fr", "en")}
+
+
+def _normalize(text):
+    # Mêmes conventions que les profils langdetect : minuscules, un espace autour de chaque mot
+    text = unicodedata.normalize("NFC", text.lower())
+    text = re.sub(r"[^\wÀ-ɏ]+|\d+|_", " ", text)
+    return " " + re.sub(r"\s+", " ", text).strip() + " "
+
+
+def _ngrams(text):
+    for n in (1, 2, 3):
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            if gram.strip():
+                yield n, gram
+
+
+def _latin_scores(text):
+    scores = dict.fromkeys(_PROFILES, 0.0)
+    for n, gram in _ngrams(_normalize(text)):
+        for lang, model in _PROFILES.items():
+            log_probs, unseen = model[n]
+            scores[lang] += log_probs.get(gram, unseen)
+    return scores
+
+
+def _short_text_lang(text):
+    # (décidé, langue) : langue None = mots neutres uniquement ; non décidé -> modèle n-grammes
+    words = unicodedata.normalize("NFD", _normalize(text)).encode("ascii", "ignore").decode().split()
+    if not words or len(words) > SHORT_TEXT_WORDS:
+        return False, None
+    words = [word for word in words if word not in NEUTRAL_WORDS]
+    if not words:
+        return True, None
+    matches = [lang for lang, lexicon in SHORT_LEXICON.items() if all(word in lexicon for word in words)]
+    return (True, matches[0]) if len(matches) == 1 else (False, None)
+
+
+def _identify(text, default):
+    arabic = len(ARABIC_RE.findall(text))
+    latin = len(LATIN_RE.findall(text))
+    if arabic == 0 and latin == 0:
+        return default
+    if arabic >= latin:
+        return "ar"
+
+    decided, lang = _short_text_lang(text)
+    if decided:
+        return lang or default
+
+    scores = _latin_scores(text)
+    return max(("fr", "en"), key=lambda lang: scores[lang])
+
+
+@lru_cache(maxsize=LANG_ID_MEMO_SIZE)
+def _identify_memo(text, default):
+    return _identify(text, default)
+
+
+def identify_lang(text, default="en"):
+    text = (text or "").strip()
+    if len(text) <= LANG_ID_MEMO_MAX_LEN:
+        return _identify_memo(text, default)
+    return _identify(text, default)
@@ -0,0 +1,104 @@
+import re
+import unicodedata
+
+# === Détection des demandes de traduction de la dernière réponse ("en arabe", "in English"...) ===
+# Résolu sans modèle : un motif combiné précompilé écarte d'abord les messages sans aucun indice,
+# puis un trie de mots-clés (par mots) trouve l'expression la plus longue.
+#   "match"     -> langue cible certaine
+#   "none"      -> pas une demande de traduction (aucun encodage nécessaire)
+#   "ambiguous" -> indice faible ("en", "traduire" seul...) : à confirmer par les intentions (embeddings)
+
+LANGUAGE_PHRASES = {
+    "ar": [
+        "arabe", "arabic", "en arabe", "in arabic", "traduire en arabe", "traduis en arabe",
+        "to arabic", "into arabic", "translate to arabic", "translate into arabic", "vers l arabe",
+        "عربي", "العربيه", "بالعربيه", "بالعربي", "باللغه العربيه", "ترجم الى العربيه",
+    ],
+    "fr": [
+        "francais", "french", "en francais", "in french", "traduire en francais", "traduis en francais",
+        "to french", "into french", "translate to french", "translate into french", "vers le francais",
+        "فرنسي", "الفرنسيه", "بالفرنسيه", "بالفرنسي", "باللغه الفرنسيه", "ترجم الى الفرنسيه",
+    ],
+    "en": [
+        "english", "anglais", "en anglais", "in english", "traduire en anglais", "traduis en anglais",
+        "to english", "into english", "translate to english", "translate into english", "vers l anglais",
+        "انجليزي", "الانجليزيه", "بالانجليزيه", "بالانجليزي", "انكليزي", "بالانكليزيه", "باللغه الانجليزيه",
+    ],
+}
+
+# Codes seuls ("ar", "fr", "en") : fiables uniquement si le message ne contient presque rien d'autre
+# ("en" est aussi une préposition française très courante)
+LANGUAGE_CODES = {"ar": "ar", "fr": "fr", "en": "en"}
+WEAK_CUES = ["traduire", "traduis", "traduction", "translate", "translation", "ترجم", "ترجمه"]
+FILLER_WORDS = {"svp", "stp", "please", "plz", "merci", "thanks", "من", "فضلك", "لو", "سمحت"}
+TARGET_PRIORITY = ["ar", "fr", "en"]
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return text.replace('ى', 'ي').replace('ة', 'ه').replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا')
+
+
+def tokenize(text):
+    return re.findall(r"\w+", normalize(text))
+
+
+def _build_trie():
+    trie = {}
+    for lang, phrases in LANGUAGE_PHRASES.items():
+        for phrase in phrases:
+            node = trie
+            for token in tokenize(phrase):
+                node = node.setdefault(token, {})
+            node["$"] = lang
+    return trie
+
+
+_TRIE = _build_trie()
+_TRIGGER = re.compile(
+    r"\b(?:" + "|".join(sorted(
+        {re.escape(t) for phrases in LANGUAGE_PHRASES.values() for p in phrases for t in tokenize(p)}
+        | {re.escape(t) for t in LANGUAGE_CODES}
+        | {re.escape(normalize(t)) for t in WEAK_CUES},
+        key=len, reverse=True
+    )) + r")\b"
+)
+_WEAK = {normalize(t) for t in WEAK_CUES}
+
+
+def _longest_match(tokens, start):
+    node, found, length = _TRIE, None, 0
+    for i in range(start, len(tokens)):
+        node = node.get(tokens[i])
+        if node is None:
+            break
+        if "$" in node:
+            found, length = node["$"], i - start + 1
+    return found, length
+
+
+def detect_language_switch(text):
+    normalized = normalize(text)
+    # ⚡ Aucun mot-clé : réponse immédiate, sans découpage
+    if not _TRIGGER.search(normalized):
+        return None, "none"
+
+    tokens = re.findall(r"\w+", normalized)
+    best, best_length = None, 0
+    for start in range(len(tokens)):
+        lang, length = _longest_match(tokens, start)
+        if lang and (length > best_length or (length == best_length and TARGET_PRIORITY.index(lang) < TARGET_PRIORITY.index(best))):
+            best, best_length = lang, length
+    if best:
+        return best, "match"
+
+    # Code de langue seul ("en", "ar svp", "traduire fr")
+    content = [t for t in tokens if t not in FILLER_WORDS and t not in _WEAK]
+    codes = [LANGUAGE_CODES[t] for t in content if t in LANGUAGE_CODES]
+    if codes and len(content) == 1:
+        return codes[0], "match"
+
+    if codes or any(t in _WEAK for t in tokens):
+        return None, "ambiguous"
+    return None, "none"
@@ -0,0 +1,106 @@
+import heapq
+import math
+import os
+import threading
+from collections import Counter
+
+# === Index lexical BM25 (index inversé) ===
+# Construit sur les textes déjà nettoyés par text_api (minuscules, sans accents ni mots vides),
+# un index par langue et par type de contenu (réponses textuelles, noms de catégories).
+# Les documents sont identifiés par l'id de leur ligne : remove / replace permettent
+# de suivre les commits sans reconstruire l'index. Les IDF sont calculés à la recherche.
+
+BM25_K1 = float(os.environ.get("CHATBOT_BM25_K1", 1.2))
+BM25_B = float(os.environ.get("CHATBOT_BM25_B", 0.75))
+
+
+def tokenize(clean_text):
+    return clean_text.split()
+
+
+class LexicalHit:
+    __slots__ = ("id", "score")
+
+    def __init__(self, doc_id, score):
+        self.id = doc_id
+        self.score = score
+
+
+class BM25Index:
+    def __init__(self, documents=(), k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # terme -> {id: fréquence}
+        self.lengths = {}  # id -> nombre de termes
+        self.terms = {}  # id -> termes distincts (pour retirer le document)
+        self.total_length = 0
+        self._lock = threading.Lock()
+        for doc_id, text in documents:
+            self._add(doc_id, text)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _add(self, doc_id, text):
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.lengths[doc_id] = sum(counts.values())
+        self.terms[doc_id] = set(counts)
+        self.total_length += self.lengths[doc_id]
+
+    def _remove(self, doc_id):
+        if doc_id not in self.lengths:
+            return
+        for term in self.terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def replace(self, doc_id, text):
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, text)
+
+    def distinct_terms(self, doc_id):
+        return len(self.terms.get(doc_id, ()))
+
+    def containing(self, query_terms):
+        # ids des documents qui contiennent tous les termes (intersection des listes, la plus courte d'abord)
+        query_terms = set(query_terms)
+        with self._lock:
+            postings = sorted((self.postings.get(term, {}) for term in query_terms), key=len)
+            if not postings or not postings[0]:
+                return set()
+            ids = set(postings[0])
+            for posting in postings[1:]:
+                ids.intersection_update(posting)
+                if not ids:
+                    break
+            return ids
+
+    def search(self, query_terms, k=10):
+        query_terms = set(query_terms)
+        with self._lock:
+            n = len(self.lengths)
+            if not n or not query_terms:
+                return []
+            avg_length = self.total_length / n or 1.0
+            scores = Counter()
+            for term in query_terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [LexicalHit(doc_id, score) for doc_id, score in best]
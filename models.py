@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from config_cache import settings_cache
 
 db = SQLAlchemy()
 
@@ -49,6 +50,12 @@ class Response(db.Model):
         return f'<Response {self.type}>'
 
 
+class Admin(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(200), nullable=False)
+    role = db.Column(db.String(20), default='admin')
+
 
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -61,6 +68,14 @@ class Log(db.Model):
     # ✅ Relation avec Admin
     admin = db.relationship('Admin', backref='logs')
 
+    # 📇 Pagination par curseur (timestamp, id), éventuellement filtrée par admin / action / cible
+    __table_args__ = (
+        db.Index('ix_log_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_log_admin_timestamp', 'admin_id', 'timestamp', 'id'),
+        db.Index('ix_log_action_timestamp', 'action', 'timestamp', 'id'),
+        db.Index('ix_log_target_timestamp', 'target_type', 'target_id', 'timestamp', 'id'),
+    )
+
 
 class Setting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,8 +84,8 @@ class Setting(db.Model):
 
     @staticmethod
     def get_value(key, default=None):
-        setting = Setting.query.filter_by(key=key).first()
-        return setting.value if setting else default
+        # ⚡ Lecture en mémoire (cf. config_cache), rechargée par set_value
+        return settings_cache.get(key, default)
 
     @staticmethod
     def set_value(key, value):
@@ -81,4 +96,61 @@ class Setting(db.Model):
             setting = Setting(key=key, value=value)
             db.session.add(setting)
         db.session.commit()
+        settings_cache.reload()
+
+
+
+class TranslationJob(db.Model):
+    __tablename__ = 'translation_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    target_type = db.Column(db.String(20), nullable=False)  # category, response
+    target_id = db.Column(db.Integer, nullable=False, index=True)
+    source_lang = db.Column(db.String(5), nullable=False)
+    source_text = db.Column(db.Text, nullable=False)
+    pivot_lang = db.Column(db.String(5), nullable=True)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, running, done, error, cancelled
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # nouvelle tentative après échec (backoff)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TranslationJob {self.target_type}#{self.target_id} {self.status}>'
 
+
+class ContentStat(db.Model):
+    __tablename__ = 'content_stat'
+
+    # categories, responses, type:<type>, lang:<source_lang>
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ContentStat {self.key}={self.value}>'
+
+
+class StoredFile(db.Model):
+    __tablename__ = 'stored_file'
+
+    # Fichier adressé par son contenu : uploads/<digest><extension>, un seul exemplaire par contenu
+    digest = db.Column(db.String(64), primary_key=True)  # sha256 hexadécimal
+    extension = db.Column(db.String(20), nullable=False, default='')
+    size = db.Column(db.Integer, nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    original_name = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Post-traitement en arrière-plan (cf. file_processing) : miniature, texte extrait pour la recherche
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, done, error
+    thumbnail = db.Column(db.String(100), nullable=True)
+    text_content = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    @property
+    def filename(self):
+        return self.digest + self.extension
+
+    def __repr__(self):
+        return f'<StoredFile {self.filename}>'
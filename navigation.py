@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from sqlalchemy import func
+from models import db, Category, Response, ContentStat
+from content_events import on_content_change
+
+# === Navigation publique par catégories ===
+# Instantané immuable de tout l'arbre de navigation, par langue : sous-catégories visibles
+# de chaque parent (avec has_children / response_count) et réponses de chaque catégorie.
+# Construit en trois requêtes, reconstruit uniquement après une modification du contenu
+# (content_events) ou à l'expiration du TTL (écritures d'un autre processus).
+# Sa version est tirée des compteurs de content_stat (dont "version", incrémenté à chaque écriture
+# de contenu) et de la dernière modification des réponses : identique d'un processus à l'autre,
+# elle sert d'ETag fort pour les navigateurs et un éventuel CDN.
+# Les réponses sont lues une fois (toutes langues) et converties par catégorie à la demande ;
+# seuls les corps des catégories présentes dans l'instantané sont mis en cache.
+
+NAV_LANGS = ("fr", "en", "ar")
+NAV_SNAPSHOT_TTL = float(os.environ.get("CHATBOT_NAV_SNAPSHOT_TTL", 300))
+
+
+def nav_lang(lang):
+    # Toute autre langue retombe sur le français (comportement historique des routes)
+    return lang if lang in NAV_LANGS else "fr"
+
+
+class NavigationSnapshot:
+    def __init__(self, version, children, responses, category_ids):
+        self.version = version
+        self.children = children  # lang -> {parent_id: [noeuds]}
+        self.responses = responses  # category_id -> [lignes réponse, toutes langues]
+        self.category_ids = category_ids  # toutes les catégories, visibles ou non
+        self.expires_at = time.monotonic() + NAV_SNAPSHOT_TTL
+        self._bodies = {}
+        self._bodies_lock = threading.Lock()
+
+    def category_nodes(self, parent_id, lang):
+        return self.children[nav_lang(lang)].get(parent_id, [])
+
+    def category_responses(self, category_id, lang):
+        answer_field = f"answer_{nav_lang(lang)}"
+        return [
+            {"id": r.id, "type": r.type, "answer": getattr(r, answer_field), "file_url": r.file_url}
+            for r in self.responses.get(category_id, [])
+        ]
+
+    def knows(self, key):
+        # Clés bornées par le contenu : tout identifiant de la clé doit exister dans l'instantané
+        return all(part in self.category_ids for part in key if isinstance(part, int))
+
+    def body(self, key, render):
+        # 🧊 Corps JSON sérialisé une seule fois par instantané (clés connues uniquement)
+        body = self._bodies.get(key)
+        if body is None:
+            body = render()
+            if self.knows(key):
+                with self._bodies_lock:
+                    self._bodies[key] = body
+        return body
+
+    def etag(self, key):
+        return "-".join([self.version] + [str(part) for part in key])
+
+
+def _translated_name(row, lang):
+    if lang == 'ar':
+        return row.name_ar or row.name_fr
+    if lang == 'en':
+        return row.name_en or row.name_fr
+    return row.name_fr
+
+
+def build_snapshot():
+    categories = (
+        db.session.query(Category.id, Category.parent_id, Category.name_fr, Category.name_en, Category.name_ar, Category.visible)
+        .order_by(Category.id)
+        .all()
+    )
+    response_counts = dict(
+        db.session.query(Response.category_id, func.count(Response.id)).group_by(Response.category_id).all()
+    )
+    responses = (
+        db.session.query(Response.id, Response.category_id, Response.type, Response.answer_fr, Response.answer_en, Response.answer_ar, Response.file_url)
+        .join(Category, Response.category_id == Category.id)
+        .filter(Category.visible == True)
+        .order_by(Response.id)
+        .all()
+    )
+
+    visible_children = {}
+    for row in categories:
+        if row.visible:
+            visible_children[row.parent_id] = visible_children.get(row.parent_id, 0) + 1
+
+    by_category = {}
+    for r in responses:
+        by_category.setdefault(r.category_id, []).append(r)
+
+    children = {}
+    for lang in NAV_LANGS:
+        children[lang] = {}
+        for row in categories:
+            if row.visible:
+                children[lang].setdefault(row.parent_id, []).append({
+                    "id": row.id,
+                    "label": _translated_name(row, lang),
+                    "has_children": visible_children.get(row.id, 0) > 0,
+                    "response_count": response_counts.get(row.id, 0)
+                })
+
+    return NavigationSnapshot(content_version(len(categories), response_counts), children, by_category, {row.id for row in categories})
+
+
+def content_version(category_count, response_counts):
+    # Compteurs partagés (content_stat) + tailles + dernière modification : pas de hachage du corpus
+    stats = dict(db.session.query(ContentStat.key, ContentStat.value).filter(ContentStat.key == "version"))
+    latest = db.session.query(func.max(Response.updated_at)).scalar()
+    # Sans compteur partagé (init_stats non appelé) : version propre au processus, jamais un faux 304
+    shared = stats.get("version")
+    parts = [
+        shared if shared is not None else f"p{os.getpid()}g{_generation}",
+        category_count,
+        sum(response_counts.values()),
+        int(latest.timestamp() * 1000) if latest else 0
+    ]
+    return "v" + ".".join(str(part) for part in parts)
+
+
+_snapshot = None
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.expires_at > time.monotonic():
+        return snapshot
+
+    with _lock:
+        # 🔒 Un seul thread reconstruit, les autres réutilisent son résultat
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.expires_at > time.monotonic():
+            return snapshot
+        generation = _generation
+        snapshot = build_snapshot()
+        if generation == _generation:
+            _snapshot = snapshot
+    return snapshot
+
+
+def category_nodes(parent_id, lang):
+    return get_snapshot().category_nodes(parent_id, lang)
+
+
+@on_content_change
+def invalidate_navigation(changes=None):
+    global _snapshot, _generation
+    _generation += 1
+    _snapshot = None
@@ -1,10 +1,71 @@
-from models import db, Response, Category
-from text_api import preload_language_data, cache
+import threading
+from datetime import datetime
+from text_api import preload_language_data, embedding_store, SUPPORTED_LANGS
 
-def preload_all_languages():
-    if "text_embeddings" not in cache:
-        cache["text_embeddings"] = {}
+# === Préchargement des embeddings par langue ===
+# Chaque langue passe par : pending -> loading -> ready (ou error, réessayé au prochain appel).
+# Un verrou par langue garantit qu'un seul thread encode le corpus à la fois.
+
+warmup_state = {
+    lang: {"status": "pending", "started_at": None, "finished_at": None, "error": None}
+    for lang in SUPPORTED_LANGS
+}
+_warmup_locks = {lang: threading.Lock() for lang in SUPPORTED_LANGS}
+
+
+def is_language_ready(lang):
+    return warmup_state[lang]["status"] == "ready"
 
-    for lang in ['fr', 'en', 'ar']:
-        if lang not in cache["text_embeddings"]:
+
+def ensure_language_ready(lang):
+    if is_language_ready(lang):
+        return True
+
+    with _warmup_locks[lang]:
+        # 🔒 Un autre thread a pu terminer pendant l'attente du verrou
+        if is_language_ready(lang):
+            return True
+
+        state = warmup_state[lang]
+        state.update(status="loading", started_at=datetime.utcnow().isoformat(), error=None)
+        try:
             preload_language_data(lang)
+        except Exception as e:
+            state.update(status="error", finished_at=datetime.utcnow().isoformat(), error=str(e))
+            print(f"❌ Préchargement {lang} échoué :", e)
+            return False
+
+        state.update(status="ready", finished_at=datetime.utcnow().isoformat())
+        return True
+
+
+def preload_all_languages():
+    for lang in SUPPORTED_LANGS:
+        ensure_language_ready(lang)
+
+
+def start_background_warmup(app):
+    def _run():
+        with app.app_context():
+            preload_all_languages()
+        if all(is_language_ready(lang) for lang in SUPPORTED_LANGS):
+            # 🧹 Magasin d'embeddings réduit aux textes en service, dans l'ordre du préchargement
+            try:
+                removed = embedding_store.compact()
+                if removed:
+                    print(f"🧹 {removed} embeddings obsolètes retirés du cache disque")
+            except Exception as e:
+                print("❌ Compactage du cache d'embeddings échoué :", e)
+
+    thread = threading.Thread(target=_run, name="embeddings-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_progress():
+    ready = sum(1 for lang in SUPPORTED_LANGS if is_language_ready(lang))
+    return {
+        "ready": ready == len(SUPPORTED_LANGS),
+        "progress": ready / len(SUPPORTED_LANGS),
+        "languages": {lang: dict(state) for lang, state in warmup_state.items()}
+    }
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+
+# === Index de recherche par similarité cosinus ===
+# Même interface pour tous les index : search(query, k) -> (scores, indices) triés
+# par score décroissant. "flat" = recherche exacte (par défaut), "ivf" = index
+# inversé approximatif (k-means NumPy), utile pour les gros corpus.
+
+INDEX_KIND = os.environ.get("CHATBOT_RETRIEVAL_INDEX", "flat")
+IVF_MIN_ROWS = int(os.environ.get("CHATBOT_IVF_MIN_ROWS", 2000))
+IVF_N_PROBE = int(os.environ.get("CHATBOT_IVF_N_PROBE", 8))
+
+
+def to_matrix(embeddings):
+    if hasattr(embeddings, "detach"):
+        embeddings = embeddings.detach().cpu().numpy()
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    if np.allclose(norms, 1.0, atol=1e-3):
+        return matrix  # déjà normalisé : pas de copie (mémoire partagée avec le tenseur)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.shape[0])
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return scores[idx], idx
+
+
+class FlatIndex:
+    kind = "flat"
+
+    def __init__(self, embeddings):
+        self.matrix = to_matrix(embeddings)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def search(self, query, k=1):
+        scores = self.matrix @ to_matrix(query)[0]
+        return top_k(scores, k)
+
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, embeddings, n_lists=None, n_probe=IVF_N_PROBE, iterations=10, seed=0, centroids=None):
+        self.matrix = to_matrix(embeddings)
+        n = self.matrix.shape[0]
+        self.n_probe = n_probe
+        if centroids is None:
+            n_lists = n_lists or max(1, int(np.sqrt(n)))
+            centroids = self._train(n_lists, iterations, seed)
+        self.centroids = centroids
+        self._assign()
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    # 🎯 k-means sphérique (produit scalaire sur vecteurs normalisés)
+    def _train(self, n_lists, iterations, seed):
+        rng = np.random.default_rng(seed)
+        n = self.matrix.shape[0]
+        centroids = self.matrix[rng.choice(n, size=min(n_lists, n), replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(self.matrix @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(self.matrix[order], starts, axis=0)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = to_matrix(sums)
+        return centroids
+
+    def _assign(self):
+        labels = np.argmax(self.matrix @ self.centroids.T, axis=1) if len(self) else np.empty(0, dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.centroids.shape[0] + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.centroids.shape[0])]
+
+    def search(self, query, k=1):
+        q = to_matrix(query)[0]
+        n_probe = min(self.n_probe, self.centroids.shape[0])
+        _, probed = top_k(self.centroids @ q, n_probe)
+        candidates = np.concatenate([self.lists[i] for i in probed]) if n_probe else np.empty(0, dtype=np.int64)
+        if candidates.size == 0:
+            return top_k(np.empty(0, dtype=np.float32), k)
+        scores, local = top_k(self.matrix[candidates] @ q, k)
+        return scores, candidates[local]
+
+    def rebuild(self, embeddings):
+        # 🔁 Mise à jour incrémentale : on garde les centroïdes tant que la taille reste comparable
+        n = len(embeddings)
+        if n < IVF_MIN_ROWS:
+            return FlatIndex(embeddings)
+        if len(self) // 2 <= n <= len(self) * 2:
+            return IVFIndex(embeddings, n_probe=self.n_probe, centroids=self.centroids)
+        return IVFIndex(embeddings, n_probe=self.n_probe)
+
+
+def build_index(embeddings, kind=None):
+    kind = kind or INDEX_KIND
+    if kind == "ivf" and len(embeddings) >= IVF_MIN_ROWS:
+        return IVFIndex(embeddings)
+    return FlatIndex(embeddings)
+
+
+def update_index(index, embeddings, kind=None):
+    if isinstance(index, IVFIndex) and (kind or INDEX_KIND) == "ivf":
+        return index.rebuild(embeddings)
+    return build_index(embeddings, kind)
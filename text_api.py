@@ -1,18 +1,48 @@
 from flask import Blueprint, request, jsonify
-from langdetect import detect
 import re
 import nltk
 import unicodedata
 from pathlib import Path
 import json
+import os
 import random
 from models import db, Category, Response
-from sentence_transformers import SentenceTransformer, util
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, Session as OrmSession
 from flask import session
-
-# === Chargement du modèle SentenceTransformer ===
-model_intent = SentenceTransformer("models/all-MiniLM-L12-v2")
+from content_events import on_content_change
+from embedding_store import EmbeddingStore
+from encoder_backend import load_encoder, encoder_key
+from encode_batcher import EncodeBatcher
+from answer_cache import AnswerCache
+from retrieval_index import build_index, update_index
+from lexical_index import BM25Index, tokenize
+from conversation_state import last_answer, remember_last_answer
+from lang_switch import detect_language_switch
+from lang_id import identify_lang
+from document_chunks import document_texts, document_chunks
+import threading
+import torch
+
+# === Chargement du modèle SentenceTransformer (PyTorch ou ONNX, cf. encoder_backend) ===
+MODEL_PATH = "models/all-MiniLM-L12-v2"
+model_intent, encoder_backend = load_encoder(MODEL_PATH)
+
+# === Cache disque des embeddings (seuls les textes nouveaux sont encodés) ===
+embedding_store = EmbeddingStore(encoder_key(MODEL_PATH, encoder_backend), model_intent.get_sentence_embedding_dimension())
+
+def encode_batch(texts):
+    with torch.no_grad():
+        return model_intent.encode(texts, convert_to_numpy=True)
+
+def encode_rows(texts, cleaner="raw"):
+    return torch.from_numpy(embedding_store.get_or_encode(texts, encode_batch, cleaner))
+
+def encode_queries(texts):
+    with torch.no_grad():
+        return model_intent.encode(texts, convert_to_tensor=True)
+
+# ⚡ Les questions des requêtes concurrentes sont encodées ensemble
+query_batcher = EncodeBatcher(encode_queries)
 
 # === Chargement du fichier intents.json ===
 intent_data = {}
@@ -27,16 +57,12 @@ for intent in intent_data.get("intents", []):
     intent_responses[tag] = intent.get("responses", {})
     for pattern in intent.get("patterns", []):
         if pattern.strip():
-            try:
-                intent_phrases.append(pattern)
-                intent_tags.append(tag)
-                intent_langs.append(detect(pattern))
-            except:
-                intent_phrases.append(pattern)
-                intent_tags.append(tag)
-                intent_langs.append('fr')
+            intent_phrases.append(pattern)
+            intent_tags.append(tag)
+            intent_langs.append(identify_lang(pattern, 'fr'))
 
-intent_embeddings = model_intent.encode(intent_phrases, convert_to_tensor=True)
+intent_embeddings = encode_rows(intent_phrases)
+intent_index = build_index(intent_embeddings)
 
 text_api_bp = Blueprint('text_api_bp', __name__)
 
@@ -46,8 +72,25 @@ cache = {
     "texts_embeddings": {},
     "categories": {},
     "cat_names_clean": {},
-    "cat_embeddings": {}
+    "cat_embeddings": {},
+    "texts_index": {},
+    "cat_index": {},
+    "text_response_ids": {},
+    # Index lexicaux BM25 (par id) et position de chaque id dans les listes ci-dessus
+    "text_bm25": {},
+    "cat_bm25": {},
+    "text_positions": {},
+    "cat_positions": {},
+    # Passages des pièces jointes (réponses "file"), indexés dans la langue du document
+    "doc_chunks": {},
+    "doc_chunks_clean": {},
+    "doc_embeddings": {},
+    "doc_index": {}
 }
+cache_lock = threading.RLock()
+# Écrivains du cache (préchargement, synchronisation après commit) : sérialisés entre eux, ils encodent
+# hors de cache_lock et ne le prennent que pour publier ; les lecteurs ne sont jamais bloqués par un encodage
+cache_write_lock = threading.RLock()
 
 def normalize_common(text):
     text = text.lower()
@@ -79,195 +122,571 @@ def clean_text(text, lang='fr'):
         return clean_en(text)
     return clean_fr(text)
 
+def cleaner_name(lang):
+    return {'ar': 'clean_ar', 'en': 'clean_en'}.get(lang, 'clean_fr')
+
 def get_answer_field(lang_code):
     return {'fr': 'answer_fr', 'en': 'answer_en', 'ar': 'answer_ar'}.get(lang_code, 'answer_en')
 
+def is_indexed_response(r):
+    return r.type == 'text' and r.category is not None and r.category.visible
+
+DOC_LANG_SAMPLE = 200  # caractères du document utilisés pour identifier sa langue
+
+def documents_in_lang(texts, lang):
+    return {rid: text for rid, text in texts.items() if detect_lang(text[:DOC_LANG_SAMPLE]) == lang}
+
+# Modifications reçues pendant le chargement d'une langue : rejouées une fois le cache publié,
+# sinon un commit fait entre la lecture et la publication serait écrasé par l'instantané
+loading_changes = {}
+
 def preload_language_data(lang):
+    with cache_lock:
+        loading_changes[lang] = []
+    try:
+        load_language_data(lang)
+    finally:
+        with cache_lock:
+            loading_changes.pop(lang, None)
+
+def load_language_data(lang):
     answer_field = get_answer_field(lang)
-    responses = Response.query.options(joinedload(Response.category)).join(Response.category).filter(Category.visible == True, Response.type == 'text').all()
-    texts_clean = [clean_text(getattr(r, answer_field) or "", lang) for r in responses]
+    # 🔌 Session dédiée : les objets mis en cache ne doivent pas être expirés par les commits des requêtes
+    with OrmSession(db.engine) as s:
+        responses = s.query(Response).options(joinedload(Response.category)).join(Response.category).filter(Category.visible == True, Response.type == 'text').all()
+        categories = s.query(Category).filter_by(visible=True).all()
+        doc_texts = document_texts(s)
 
-    if texts_clean:
-        texts_embeddings = model_intent.encode(texts_clean, convert_to_tensor=True)
-        cache["text_responses"][lang] = responses
-        cache["texts_clean"][lang] = texts_clean
-        cache["texts_embeddings"][lang] = texts_embeddings
+    texts_clean = [clean_text(getattr(r, answer_field) or "", lang) for r in responses]
+    texts_embeddings = encode_rows(texts_clean, cleaner_name(lang))
 
-    categories = Category.query.filter_by(visible=True).all()
     cat_names_clean = [clean_text(c.get_translated_name(lang) or "", lang) for c in categories]
+    cat_embeddings = encode_rows(cat_names_clean, cleaner_name(lang))
+
+    # 📄 Passages des documents joints, encodés en un seul lot
+    doc_chunks = document_chunks(documents_in_lang(doc_texts, lang))
+    doc_chunks_clean = [clean_text(c["text"], lang) for c in doc_chunks]
+    doc_embeddings = encode_rows(doc_chunks_clean, cleaner_name(lang))
+
+    texts_index, cat_index, doc_index = build_index(texts_embeddings), build_index(cat_embeddings), build_index(doc_embeddings)
+    text_bm25 = BM25Index(zip([r.id for r in responses], texts_clean))
+    cat_bm25 = BM25Index(zip([c.id for c in categories], cat_names_clean))
+
+    with cache_write_lock:
+        with cache_lock:
+            cache["text_responses"][lang] = responses
+            cache["text_response_ids"][lang] = {r.id: r for r in responses}
+            cache["texts_clean"][lang] = texts_clean
+            cache["texts_embeddings"][lang] = texts_embeddings
+            cache["texts_index"][lang] = texts_index
+            cache["categories"][lang] = categories
+            cache["cat_names_clean"][lang] = cat_names_clean
+            cache["cat_embeddings"][lang] = cat_embeddings
+            cache["cat_index"][lang] = cat_index
+            cache["text_bm25"][lang] = text_bm25
+            cache["cat_bm25"][lang] = cat_bm25
+            cache["text_positions"][lang] = {r.id: i for i, r in enumerate(responses)}
+            cache["cat_positions"][lang] = {c.id: i for i, c in enumerate(categories)}
+            cache["doc_chunks"][lang] = doc_chunks
+            cache["doc_chunks_clean"][lang] = doc_chunks_clean
+            cache["doc_embeddings"][lang] = doc_embeddings
+            cache["doc_index"][lang] = doc_index
+
+            # 🔁 Commits arrivés pendant l'encodage, rejoués avant tout autre écrivain
+            buffered = loading_changes.pop(lang, [])
+        if buffered:
+            apply_changes(buffered, [lang])
+
+# === Mise à jour incrémentale du cache après commit ===
+LEXICAL_KEYS = {"text_responses": ("text_bm25", "text_positions"), "categories": ("cat_bm25", "cat_positions")}
+
+def patch_cache_rows(lang, rows_key, clean_key, emb_key, index_key, affected_ids, fresh):
+    # fresh : {id: (objet, texte nettoyé)} pour les lignes qui doivent rester/entrer dans le cache
+    # Appelé sous cache_write_lock : encodage hors de cache_lock, pris seulement pour publier
+    fresh = dict(fresh)
+    old_rows = cache[rows_key].get(lang, [])
+    old_clean = cache[clean_key].get(lang, [])
+    old_emb = cache[emb_key].get(lang)
+    if old_emb is None:
+        old_emb = encode_rows([], cleaner_name(lang))
+
+    kept, rows, cleans, to_encode = [], [], [], []
+    for i, obj in enumerate(old_rows):
+        if obj.id in affected_ids:
+            if obj.id not in fresh:
+                continue  # 🗑️ ligne supprimée ou devenue invisible
+            obj, text = fresh.pop(obj.id)
+            if text != old_clean[i]:
+                to_encode.append((len(rows), text))
+        else:
+            text = old_clean[i]
+        kept.append(i)
+        rows.append(obj)
+        cleans.append(text)
+
+    # ➕ Nouvelles lignes, ajoutées en fin de matrice
+    for obj, text in fresh.values():
+        to_encode.append((len(rows), text))
+        rows.append(obj)
+        cleans.append(text)
+
+    embeddings = old_emb.index_select(0, torch.tensor(kept, dtype=torch.long, device=old_emb.device))
+    if to_encode:
+        encoded = encode_rows([text for _, text in to_encode], cleaner_name(lang)).to(embeddings.device)
+        n_replaced = sum(1 for pos, _ in to_encode if pos < len(kept))
+        for k in range(n_replaced):
+            embeddings[to_encode[k][0]] = encoded[k]
+        embeddings = torch.cat([embeddings, encoded[n_replaced:]])
+
+    index = update_index(cache[index_key].get(lang), embeddings)
+
+    # 🔤 Index BM25 : seules les lignes touchées sont retirées / réindexées
+    bm25_key, positions_key = LEXICAL_KEYS[rows_key]
+    bm25 = cache[bm25_key].get(lang) or BM25Index()
+    remaining = set()
+    for obj, text in zip(rows, cleans):
+        if obj.id in affected_ids:
+            bm25.replace(obj.id, text)
+            remaining.add(obj.id)
+    for obj_id in set(affected_ids) - remaining:
+        bm25.remove(obj_id)
+
+    with cache_lock:
+        cache[rows_key][lang] = rows
+        if rows_key == "text_responses":
+            cache["text_response_ids"][lang] = {r.id: r for r in rows}
+        cache[clean_key][lang] = cleans
+        cache[emb_key][lang] = embeddings
+        cache[index_key][lang] = index
+        cache[bm25_key][lang] = bm25
+        cache[positions_key][lang] = {obj.id: i for i, obj in enumerate(rows)}
+
+def patch_doc_chunks(lang, affected_ids, fresh_chunks):
+    # Les passages d'une réponse modifiée sont tous remplacés ; les autres gardent leurs embeddings
+    # (même protocole de verrous que patch_cache_rows)
+    old_chunks = cache["doc_chunks"].get(lang, [])
+    if not fresh_chunks and not any(c["response_id"] in affected_ids for c in old_chunks):
+        return
+
+    old_clean = cache["doc_chunks_clean"].get(lang, [])
+    old_emb = cache["doc_embeddings"].get(lang)
+    if old_emb is None:
+        old_emb = encode_rows([], cleaner_name(lang))
+
+    kept = [i for i, c in enumerate(old_chunks) if c["response_id"] not in affected_ids]
+    chunks = [old_chunks[i] for i in kept] + fresh_chunks
+    cleans = [old_clean[i] for i in kept] + [clean_text(c["text"], lang) for c in fresh_chunks]
+
+    embeddings = old_emb.index_select(0, torch.tensor(kept, dtype=torch.long, device=old_emb.device))
+    if fresh_chunks:
+        encoded = encode_rows(cleans[len(kept):], cleaner_name(lang)).to(embeddings.device)
+        embeddings = torch.cat([embeddings, encoded])
+
+    index = update_index(cache["doc_index"].get(lang), embeddings)
+
+    with cache_lock:
+        cache["doc_chunks"][lang] = chunks
+        cache["doc_chunks_clean"][lang] = cleans
+        cache["doc_embeddings"][lang] = embeddings
+        cache["doc_index"][lang] = index
+
+@on_content_change
+def sync_cache_with_changes(changes):
+    with cache_lock:
+        for buffered in loading_changes.values():
+            buffered.extend(changes)
+        langs = [lang for lang in cache["texts_embeddings"] if lang not in loading_changes]
+    if langs:
+        apply_changes(changes, langs)
+
+def apply_changes(changes, langs):
+    response_ids = {c["id"] for c in changes if c["kind"] == "response"}
+    category_ids = {c["id"] for c in changes if c["kind"] == "category"}
+
+    # 🔌 Session dédiée : la session de la requête vient d'être commitée
+    with OrmSession(db.engine) as s:
+        if category_ids:
+            # Les réponses d'une catégorie modifiée (visibilité, nom) sont aussi concernées
+            response_ids |= {rid for (rid,) in s.query(Response.id).filter(Response.category_id.in_(category_ids))}
+            for lang in langs:
+                response_ids |= {r.id for r in cache["text_responses"].get(lang, []) if r.category_id in category_ids}
+
+        responses = s.query(Response).options(joinedload(Response.category)).filter(Response.id.in_(response_ids)).all() if response_ids else []
+        categories = s.query(Category).filter(Category.id.in_(category_ids)).all() if category_ids else []
+        doc_texts = document_texts(s, response_ids) if response_ids else {}
+
+    responses = [r for r in responses if is_indexed_response(r)]
+    categories = [c for c in categories if c.visible]
+
+    with cache_write_lock:
+        for lang in langs:
+            answer_field = get_answer_field(lang)
+            if response_ids:
+                fresh = {r.id: (r, clean_text(getattr(r, answer_field) or "", lang)) for r in responses}
+                patch_cache_rows(lang, "text_responses", "texts_clean", "texts_embeddings", "texts_index", response_ids, fresh)
+                patch_doc_chunks(lang, response_ids, document_chunks(documents_in_lang(doc_texts, lang)))
+            if category_ids:
+                fresh = {c.id: (c, clean_text(c.get_translated_name(lang) or "", lang)) for c in categories}
+                patch_cache_rows(lang, "categories", "cat_names_clean", "cat_embeddings", "cat_index", category_ids, fresh)
+
+# === Langues servies : identification restreinte à fr/en/ar (voir lang_id.py) ===
+SUPPORTED_LANGS = ['fr', 'en', 'ar']
+DEFAULT_LANG = 'en'
+
+def detect_lang(text):
+    return identify_lang(text, DEFAULT_LANG)
+
+# === Préparation de la question (langue + nettoyage) ===
+def prepare_query(question, lang=None):
+    if lang is None:
+        lang = detect_lang(question)
+
+    return {
+        "text": question,
+        "lang": lang,
+        "clean": clean_text(question, lang)
+    }
 
-    if cat_names_clean:
-        cat_embeddings = model_intent.encode(cat_names_clean, convert_to_tensor=True)
-        cache["categories"][lang] = categories
-        cache["cat_names_clean"][lang] = cat_names_clean
-        cache["cat_embeddings"][lang] = cat_embeddings
+# === Encodage unique de la question (brute + nettoyée), à la demande ===
+def embed_query(query):
+    if "raw_embed" not in query:
+        # 🔁 Un seul appel batché pour les deux variantes de la question
+        embeddings = query_batcher.encode([query["text"], query["clean"]])
+        query["raw_embed"] = embeddings[0]
+        query["clean_embed"] = embeddings[1:2]
+    return query["raw_embed"], query["clean_embed"]
+
+# === Sélection des candidats (réponses textuelles) ===
+TEXT_MATCH_THRESHOLD = 0.3
+CATEGORY_MATCH_THRESHOLD = 0.3
+DOC_MATCH_THRESHOLD = float(os.environ.get("CHATBOT_DOC_MATCH_THRESHOLD", 0.35))
+DOC_EXCERPT_LENGTH = 300
+CLARIFICATION_WINDOW = 0.05
+MAX_CLARIFICATION_OPTIONS = max(1, int(os.environ.get("CHATBOT_MAX_CLARIFICATION_OPTIONS", 5)))
+
+def select_candidates(top_scores, top_indices, threshold, window):
+    # ⚡ Seuils appliqués en NumPy sur les k meilleurs scores renvoyés par l'index
+    best_score = float(top_scores[0])
+    best_index = int(top_indices[0])
+
+    close = (top_scores >= threshold) & (top_scores >= best_score - window)
+    return best_index, best_score, top_indices[close].tolist()
+
+# === Cache des réponses déjà résolues ===
+answer_cache = AnswerCache()
+
+@on_content_change
+def invalidate_answer_cache(changes):
+    answer_cache.invalidate()
+
+def load_by_ids(model, ids, *options):
+    rows = model.query.options(*options).filter(model.id.in_(ids)).all() if ids else []
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
 
 @text_api_bp.route("/api/ask", methods=["POST"])
 def ask_question_route():
     data = request.get_json()
     return ask_question(data.get("question", "").strip())
 
-def ask_question(question_text):
+def ask_question(question_text, query=None):
     question = question_text.strip()
     if not question:
         return jsonify({"error": "Aucune question fournie"}), 400
 
-    try:
-        lang = detect(question)
-    except:
-        lang = 'en'
+    # ✅ La question peut déjà avoir été préparée/encodée par l'appelant (ex. /api/start)
+    if query is None or query["text"] != question:
+        query = prepare_query(question)
 
-    answer_field = get_answer_field(lang)
-    question_clean = clean_text(question, lang)
-
-    from torch import no_grad
-    import re
-
-    # 🔁 Bloc traduction (si demande explicite)
-    if "last_answer" in session:
-        q_embed = model_intent.encode(question, convert_to_tensor=True)
-        scores = util.cos_sim(q_embed, intent_embeddings)[0]
-        best_score = float(scores.max())
-        best_idx = int(scores.argmax())
-        best_tag = intent_tags[best_idx]
-
-        expressions = {
-            "ar": [r"\barabe\b", r"\barabic\b", r"\ben arabe\b", r"\btraduire en arabe\b", r"\bar\b"],
-            "fr": [r"\bfrançais\b", r"\bfrench\b", r"\ben français\b", r"\btraduire en français\b", r"\bfr\b"],
-            "en": [r"\benglish\b", r"\banglais\b", r"\ben anglais\b", r"\btraduire en anglais\b", r"\ben\b"]
-        }
-
-        matched_target = None
-        for lang_code, patterns in expressions.items():
-            for pattern in patterns:
-                if re.search(pattern, question.lower()):
-                    matched_target = lang_code
-                    break
-            if matched_target:
-                break
-
-        if best_score > 0.6 and best_tag.startswith("translate_"):
-            target = best_tag.split("_")[1]
-        elif matched_target:
-            target = matched_target
-        else:
-            target = None
+    lang = query["lang"]
 
+    # 🔁 Bloc traduction (si demande explicite) : mots-clés d'abord, embeddings seulement si ambigu
+    last = last_answer(session)
+    if last is not None:
+        target, status = detect_language_switch(question)
+        if status == "ambiguous":
+            target = translate_intent_target(query)
         if target:
-            last = session["last_answer"]
-            translated = last.get(f"answer_{target}") or ""
-            return jsonify({
-                "response": translated,
-                "type": last.get("type"),
-                "category": last.get("category"),
-                "response_id": last.get("response_id"),
-                "file_url": last.get("file_url"),
-                "suggestions": [
-                    { "label": "🔙 Revenir au menu", "action": "restart" },
-                    { "label": "✅ Terminer", "action": "end" }
-                ]
-            })
+            return render_last_answer(last, target)
+
+    # ⚡ Questions fréquentes : décision déjà connue, ni encodage ni recherche
+    key = answer_cache.key(lang, query["clean"])
+    decision = answer_cache.get(key)
+    if decision is None:
+        decision = match_question(query)
+        answer_cache.put(key, decision)
+
+    return render_decision(decision, lang)
+
+# === Recherche lexicale (BM25) : premier étage sans encodeur + re-classement des candidats sémantiques ===
+LEXICAL_WEIGHT = float(os.environ.get("CHATBOT_LEXICAL_WEIGHT", 0.15))
+LEXICAL_CANDIDATES = 20
+LEXICAL_MIN_TERMS = 2  # réponses textuelles : au moins deux termes pour décider sans la recherche sémantique
+
+# Vocabulaire des intentions (salutations, remerciements, traduction...) : ces questions
+# passent toujours par le modèle d'intentions
+intent_vocabulary = {
+    term for pattern, pattern_lang in zip(intent_phrases, intent_langs)
+    for term in tokenize(clean_text(pattern, pattern_lang))
+}
+
+def lexical_snapshot(lang, bm25_key, rows_key, positions_key):
+    with cache_lock:
+        return cache[bm25_key].get(lang), cache[rows_key].get(lang, []), cache[positions_key].get(lang, {})
+
+def resolve_hits(hits, rows, positions):
+    # L'index BM25 est mis à jour sur place : on ignore les ids pas encore (ou plus) dans la liste
+    resolved = []
+    for hit in hits:
+        pos = positions.get(hit.id)
+        if pos is not None and pos < len(rows) and rows[pos].id == hit.id:
+            resolved.append((pos, hit))
+    return resolved
+
+def lexical_terms(query):
+    from preload_utils import is_language_ready
+    terms = set(tokenize(query["clean"]))
+    if not terms or terms & intent_vocabulary or not is_language_ready(query["lang"]):
+        return None
+    return terms
+
+def unique_full_match(terms, bm25_key, rows_key, positions_key, lang, exact=False):
+    # Unicité vérifiée sur l'intersection des listes de l'index (pas sur un top-k)
+    bm25, rows, positions = lexical_snapshot(lang, bm25_key, rows_key, positions_key)
+    if bm25 is None:
+        return None
+    ids = bm25.containing(terms)
+    if exact:
+        ids = {doc_id for doc_id in ids if bm25.distinct_terms(doc_id) == len(terms)}
+    if len(ids) != 1:
+        return None
+    pos = positions.get(next(iter(ids)))
+    if pos is None or pos >= len(rows) or rows[pos].id not in ids:
+        return None
+    return rows[pos]
+
+def lexical_category_match(query):
+    # ⚡ Nom de catégorie identique à la question ("casier judiciaire") : décision sans appel au transformer
+    terms = lexical_terms(query)
+    if terms is None:
+        return None
+    category = unique_full_match(terms, "cat_bm25", "categories", "cat_positions", query["lang"], exact=True)
+    return category_decision(category) if category is not None else None
+
+def lexical_text_match(query):
+    # ⚡ Une seule réponse textuelle contient tous les termes de la question
+    terms = lexical_terms(query)
+    if terms is None or len(terms) < LEXICAL_MIN_TERMS:
+        return None
+    response = unique_full_match(terms, "text_bm25", "text_responses", "text_positions", query["lang"])
+    return {"kind": "text_response", "response_id": response.id} if response is not None else None
+
+def fuse_lexical(lang, query, scores, indices, threshold, bm25_key, rows_key, positions_key):
+    # Les seuils restent sur le cosinus : seuls les candidats qui le passent déjà sont re-classés,
+    # par cosinus + LEXICAL_WEIGHT * BM25 normalisé (0..1). Renvoie [(cosinus, position)].
+    passed = [(float(score), int(i)) for score, i in zip(scores, indices) if score >= threshold]
+    if len(passed) < 2:
+        return passed
+
+    bm25, rows, positions = lexical_snapshot(lang, bm25_key, rows_key, positions_key)
+    hits = resolve_hits(bm25.search(tokenize(query["clean"]), LEXICAL_CANDIDATES), rows, positions) if bm25 is not None else []
+    if not hits:
+        return passed
+
+    top_lexical = hits[0][1].score or 1.0
+    lexical = {pos: hit.score / top_lexical for pos, hit in hits}
+    return sorted(passed, key=lambda item: -(item[0] + LEXICAL_WEIGHT * lexical.get(item[1], 0.0)))
+
+# === Recherche de la meilleure réponse (sans effet de bord) ===
+def category_decision(best_cat):
+    fallback_response = Response.query.filter(
+        Response.category_id == best_cat.id,
+        Response.type != 'text'
+    ).first()
+    if fallback_response:
+        return {"kind": "category_response", "response_id": fallback_response.id}
+
+    # 🔁 Suggérer les sous-catégories visibles si aucun fallback
+    subcats = Category.query.filter_by(parent_id=best_cat.id, visible=True).all()
+    if subcats:
+        return {"kind": "subcategories", "category_ids": [c.id for c in subcats]}
+    return None
+
+def match_question(query):
+    lang = query["lang"]
+
+    # ⚡ Nom de catégorie identique à la question : décision sans appel au transformer
+    decision = lexical_category_match(query)
+    if decision:
+        return decision
+
+    raw_embed, clean_embed = embed_query(query)
 
     # 🔁 Intentions
-    with no_grad():
-        q_embed = model_intent.encode(question, convert_to_tensor=True)
-        scores = util.cos_sim(q_embed, intent_embeddings)[0]
-        best_score = float(scores.max())
-        best_idx = int(scores.argmax())
-
-        if best_score > 0.6:
-            tag = intent_tags[best_idx]
-            lang_responses = intent_responses.get(tag, {})
-            if lang in lang_responses and lang_responses[lang]:
-                selected_response = random.choice(lang_responses[lang])
-            elif "fr" in lang_responses and lang_responses["fr"]:
-                selected_response = random.choice(lang_responses["fr"])
-            else:
-                all_responses = sum(lang_responses.values(), [])
-                selected_response = random.choice(all_responses) if all_responses else "..."
-            return jsonify({
-                "response": selected_response,
-                "type": "intent",
-                "category": None,
-                "response_id": None,
-                "file_url": None,
-                "suggestions": [
-                    { "label": "🔙 Revenir au menu", "action": "restart" },
-                    { "label": "✅ Terminer", "action": "end" }
-                ]
-            })
+    scores, indices = intent_index.search(raw_embed, 1)
+    best_score = float(scores[0])
+    best_idx = int(indices[0])
+
+    if best_score > 0.6:
+        return {"kind": "intent", "tag": intent_tags[best_idx]}
 
     # 🔁 Catégorie reconnue (fallback non text)
-    if lang not in cache["texts_embeddings"]:
-        preload_language_data(lang)
+    from preload_utils import ensure_language_ready
+    ensure_language_ready(lang)
 
-    categories = cache["categories"].get(lang, [])
+    with cache_lock:
+        categories = cache["categories"].get(lang, [])
+        cat_index = cache["cat_index"].get(lang)
     if categories:
-        cat_embeddings = cache["cat_embeddings"][lang]
-        q_embed = model_intent.encode([question_clean], convert_to_tensor=True)
-        scores = util.cos_sim(q_embed, cat_embeddings)[0]
-        best_index = int(scores.argmax())
-        best_score = float(scores[best_index])
-
-        if best_score >= 0.3:
-            best_cat = categories[best_index]
-            fallback_responses = Response.query.options(joinedload(Response.category)).filter(
-                Response.category_id == best_cat.id,
-                Response.type != 'text'
-            ).all()
-            if fallback_responses:
-                r = fallback_responses[0]
-                session["last_answer"] = {
-                    "answer_fr": r.answer_fr,
-                    "answer_en": r.answer_en,
-                    "answer_ar": r.answer_ar,
-                    "type": r.type,
-                    "category": best_cat.get_translated_name(lang),
-                    "response_id": r.id,
-                    "file_url": r.file_url
-                }
-                return jsonify({
-                    "response": getattr(r, answer_field) or "",
-                    "type": r.type,
-                    "category": best_cat.get_translated_name(lang),
-                    "response_id": r.id,
-                    "file_url": r.file_url,
-                    "suggestions": [
-                        { "label": "🔙 Revenir au menu", "action": "restart" },
-                        { "label": "✅ Terminer", "action": "end" }
-                    ]
-                })
-
-            # 🔁 Suggérer les sous-catégories visibles si aucun fallback
-            subcats = Category.query.filter_by(parent_id=best_cat.id, visible=True).all()
-            if subcats:
-                return jsonify({
-                    "clarification_required": True,
-                    "clarification_options": [
-                        { "category_id": c.id, "label": c.get_translated_name(lang) } for c in subcats
-                    ],
-                    "suggestions": [
-                        { "label": "🔙 Revenir au menu", "action": "restart" },
-                        { "label": "✅ Terminer", "action": "end" }
-                    ]
-                })
+        scores, indices = cat_index.search(clean_embed, LEXICAL_CANDIDATES)
+        ranked = fuse_lexical(lang, query, scores, indices, CATEGORY_MATCH_THRESHOLD, "cat_bm25", "categories", "cat_positions")
+
+        if ranked:
+            decision = category_decision(categories[ranked[0][1]])
+            if decision:
+                return decision
+
+    # ⚡ Correspondance lexicale unique parmi les réponses textuelles (après la catégorie, comme le modèle)
+    decision = lexical_text_match(query)
+    if decision:
+        return decision
+
+    # 📄 Meilleur passage des documents joints (retenu s'il dépasse la meilleure réponse textuelle)
+    document = match_document(lang, clean_embed)
+    document_score = document[0] if document else -1.0
 
     # 🔁 Réponses textuelles
-    responses = cache["text_responses"].get(lang, [])
+    with cache_lock:
+        responses = cache["text_responses"].get(lang, [])
+        texts_index = cache["texts_index"].get(lang)
     if responses:
-        texts_embeddings = cache["texts_embeddings"][lang]
-        q_embed = model_intent.encode([question_clean], convert_to_tensor=True)
-        scores = util.cos_sim(q_embed, texts_embeddings)[0]
-        best_index = int(scores.argmax())
-        best_score = float(scores[best_index])
-
-        close_indices = [i for i, score in enumerate(scores) if score >= 0.3 and abs(score - best_score) <= 0.05]
-        if len(close_indices) >= 2:
+        scores, indices = texts_index.search(clean_embed, MAX_CLARIFICATION_OPTIONS)
+        best_index, best_score, close_indices = select_candidates(scores, indices, TEXT_MATCH_THRESHOLD, CLARIFICATION_WINDOW)
+        ranked = [pos for _, pos in fuse_lexical(lang, query, scores, indices, TEXT_MATCH_THRESHOLD, "text_bm25", "text_responses", "text_positions")]
+
+        if len(close_indices) >= 2 and best_score >= document_score:
+            close_indices = sorted(close_indices, key=ranked.index)
+            return {"kind": "text_clarification", "response_ids": [responses[i].id for i in close_indices]}
+
+        if best_score >= TEXT_MATCH_THRESHOLD and best_score >= document_score:
+            return {"kind": "text_response", "response_id": responses[ranked[0]].id}
+
+    if document:
+        chunk = document[1]
+        return {"kind": "document_response", "response_id": chunk["response_id"], "excerpt": chunk["text"][:DOC_EXCERPT_LENGTH]}
+
+    # 🔁 Aucun résultat
+    return {"kind": "none"}
+
+def match_document(lang, clean_embed):
+    with cache_lock:
+        chunks = cache["doc_chunks"].get(lang, [])
+        doc_index = cache["doc_index"].get(lang)
+    if not chunks:
+        return None
+    scores, indices = doc_index.search(clean_embed, 1)
+    score = float(scores[0])
+    if score < DOC_MATCH_THRESHOLD:
+        return None
+    return score, chunks[int(indices[0])]
+
+NO_ANSWER_MESSAGES = {
+    "fr": "Désolé, je n’ai pas trouvé de réponse à votre question.",
+    "en": "Sorry, I couldn't find an answer to your question.",
+    "ar": "عذرًا، لم أتمكن من العثور على إجابة لسؤالك."
+}
+
+# === Demande de traduction confirmée par les intentions translate_<langue> ===
+def translate_intent_target(query):
+    q_embed, _ = embed_query(query)
+    scores, indices = intent_index.search(q_embed, 1)
+    best_tag = intent_tags[int(indices[0])]
+    if float(scores[0]) > 0.6 and best_tag.startswith("translate_"):
+        return best_tag.split("_")[1]
+    return None
+
+# === Dernière réponse relue depuis le cache (la conversation ne garde que son id) ===
+def find_response(response_id):
+    with cache_lock:
+        for by_id in cache["text_response_ids"].values():
+            if response_id in by_id:
+                return by_id[response_id]
+    # Réponses non textuelles (fichier, lien, contact) : absentes du cache d'embeddings
+    found = load_by_ids(Response, [response_id], joinedload(Response.category))
+    return found[0] if found else None
+
+def render_last_answer(last, target):
+    r = find_response(last["response_id"]) if last["kind"] == "response" else None
+    if r is not None:
+        payload = {
+            "response": getattr(r, get_answer_field(target)) or "",
+            "type": r.type,
+            "category": r.category.get_translated_name(target) if r.category else None,
+            "response_id": r.id,
+            "file_url": r.file_url
+        }
+    else:
+        payload = {
+            "response": NO_ANSWER_MESSAGES.get(target, NO_ANSWER_MESSAGES["en"]),
+            "type": "none",
+            "category": None,
+            "response_id": None,
+            "file_url": None
+        }
+    payload["suggestions"] = [
+        { "label": "🔙 Revenir au menu", "action": "restart" },
+        { "label": "✅ Terminer", "action": "end" }
+    ]
+    return jsonify(payload)
+
+# === Construction de la réponse JSON (+ mémorisation de la conversation) ===
+def render_decision(decision, lang):
+    answer_field = get_answer_field(lang)
+    kind = decision["kind"]
+
+    if kind == "intent":
+        lang_responses = intent_responses.get(decision["tag"], {})
+        if lang in lang_responses and lang_responses[lang]:
+            selected_response = random.choice(lang_responses[lang])
+        elif "fr" in lang_responses and lang_responses["fr"]:
+            selected_response = random.choice(lang_responses["fr"])
+        else:
+            all_responses = sum(lang_responses.values(), [])
+            selected_response = random.choice(all_responses) if all_responses else "..."
+        return jsonify({
+            "response": selected_response,
+            "type": "intent",
+            "category": None,
+            "response_id": None,
+            "file_url": None,
+            "suggestions": [
+                { "label": "🔙 Revenir au menu", "action": "restart" },
+                { "label": "✅ Terminer", "action": "end" }
+            ]
+        })
+
+    if kind == "subcategories":
+        subcats = load_by_ids(Category, decision["category_ids"])
+        if subcats:
+            return jsonify({
+                "clarification_required": True,
+                "clarification_options": [
+                    { "category_id": c.id, "label": c.get_translated_name(lang) } for c in subcats
+                ],
+                "suggestions": [
+                    { "label": "🔙 Revenir au menu", "action": "restart" },
+                    { "label": "✅ Terminer", "action": "end" }
+                ]
+            })
+
+    if kind == "text_clarification":
+        candidates = load_by_ids(Response, decision["response_ids"], joinedload(Response.category))
+        if candidates:
             options = [{
-                "response_id": responses[i].id,
-                "category": responses[i].category.get_translated_name(lang),
-                "preview": getattr(responses[i], answer_field)[:120] + "..."
-            } for i in close_indices]
+                "response_id": r.id,
+                "category": r.category.get_translated_name(lang),
+                "preview": (getattr(r, answer_field) or "")[:120] + "..."
+            } for r in candidates]
             return jsonify({
                 "clarification_required": True,
                 "clarification_options": options,
@@ -277,19 +696,13 @@ def ask_question(question_text):
                 ]
             })
 
-        if best_score >= 0.3:
-            r = responses[best_index]
-            session["last_answer"] = {
-                "answer_fr": r.answer_fr,
-                "answer_en": r.answer_en,
-                "answer_ar": r.answer_ar,
-                "type": r.type,
-                "category": r.category.get_translated_name(lang),
-                "response_id": r.id,
-                "file_url": r.file_url
-            }
-            return jsonify({
-                "response": getattr(r, answer_field),
+    if kind in ("category_response", "text_response", "document_response"):
+        found = load_by_ids(Response, [decision["response_id"]], joinedload(Response.category))
+        if found:
+            r = found[0]
+            remember_last_answer(session, "response", r.id)
+            payload = {
+                "response": getattr(r, answer_field) or "",
                 "type": r.type,
                 "category": r.category.get_translated_name(lang),
                 "response_id": r.id,
@@ -298,27 +711,17 @@ def ask_question(question_text):
                     { "label": "🔙 Revenir au menu", "action": "restart" },
                     { "label": "✅ Terminer", "action": "end" }
                 ]
-            })
+            }
+            if kind == "document_response":
+                # 📄 Passage du document qui correspond à la question
+                payload["excerpt"] = decision["excerpt"]
+            return jsonify(payload)
 
     # 🔁 Aucun résultat
-    default_message = {
-        "fr": "Désolé, je n’ai pas trouvé de réponse à votre question.",
-        "en": "Sorry, I couldn't find an answer to your question.",
-        "ar": "عذرًا، لم أتمكن من العثور على إجابة لسؤالك."
-    }
-
-    session["last_answer"] = {
-        "answer_fr": default_message["fr"],
-        "answer_en": default_message["en"],
-        "answer_ar": default_message["ar"],
-        "type": "none",
-        "category": None,
-        "response_id": None,
-        "file_url": None
-    }
+    remember_last_answer(session, "none")
 
     return jsonify({
-        "response": default_message.get(lang, default_message["en"]),
+        "response": NO_ANSWER_MESSAGES.get(lang, NO_ANSWER_MESSAGES["en"]),
         "type": "none",
         "category": None,
         "response_id": None,
@@ -1,36 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from argostranslate import translate
 
-def translate_with_gemma(text, source_lang, target_lang):
+# === Cache persistant des traductions (SQLite) ===
+# Clé : (hash du texte, langue source, langue cible). Les échecs ([ERROR], [NO MODEL])
+# ne sont jamais mis en cache pour pouvoir être retentés.
+
+TRANSLATION_CACHE_PATH = os.environ.get("CHATBOT_TRANSLATION_CACHE", os.path.join("instance", "translation_cache.sqlite3"))
+TRANSLATION_WORKERS = int(os.environ.get("CHATBOT_TRANSLATION_WORKERS", 3))
+
+_db_lock = threading.Lock()
+_db = None
+
+
+def _cache_db():
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(TRANSLATION_CACHE_PATH) or ".", exist_ok=True)
+        _db = sqlite3.connect(TRANSLATION_CACHE_PATH, check_same_thread=False)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("""
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                text_hash TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                translated TEXT NOT NULL,
+                PRIMARY KEY (text_hash, source_lang, target_lang)
+            )
+        """)
+        _db.commit()
+    return _db
+
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _cache_get(text, source_lang, target_lang):
     try:
-        # 🔁 Évite les traductions inutiles
-        if source_lang == target_lang:
-            return text
+        with _db_lock:
+            row = _cache_db().execute(
+                "SELECT translated FROM translation_cache WHERE text_hash = ? AND source_lang = ? AND target_lang = ?",
+                (_text_hash(text), source_lang, target_lang)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print("⚠️ Cache de traduction indisponible :", e)
+        return None
+    return row[0] if row else None
+
+
+def _cache_put(text, source_lang, target_lang, translated):
+    try:
+        with _db_lock:
+            db = _cache_db()
+            db.execute(
+                "INSERT OR REPLACE INTO translation_cache (text_hash, source_lang, target_lang, translated) VALUES (?, ?, ?, ?)",
+                (_text_hash(text), source_lang, target_lang, translated)
+            )
+            db.commit()
+    except sqlite3.Error as e:
+        print("⚠️ Cache de traduction indisponible :", e)
+
+
+# === Modèles Argos chargés une seule fois par processus ===
+_models_lock = threading.Lock()
+_installed_languages = None
+_translations = {}
+
+
+def _get_languages():
+    global _installed_languages
+    if _installed_languages is None:
+        with _models_lock:
+            if _installed_languages is None:
+                _installed_languages = {lang.code: lang for lang in translate.get_installed_languages()}
+    return _installed_languages
 
-        # 📦 Récupère les langues installées
-        installed_languages = translate.get_installed_languages()
-        from_lang = next((lang for lang in installed_languages if lang.code == source_lang), None)
-        to_lang = next((lang for lang in installed_languages if lang.code == target_lang), None)
 
-        # ✅ Si le modèle direct existe
-        if from_lang and to_lang:
-            direct = from_lang.get_translation(to_lang)
-            if direct:
-                return direct.translate(text)
+def _get_translation(source_lang, target_lang):
+    key = (source_lang, target_lang)
+    if key not in _translations:
+        languages = _get_languages()
+        from_lang, to_lang = languages.get(source_lang), languages.get(target_lang)
+        with _models_lock:
+            if key not in _translations:
+                _translations[key] = from_lang.get_translation(to_lang) if from_lang and to_lang else None
+    return _translations[key]
 
-        # 🔄 Sinon : passer par l’anglais comme pivot
-        pivot_code = "en"
-        pivot_lang = next((lang for lang in installed_languages if lang.code == pivot_code), None)
 
-        if from_lang and pivot_lang and to_lang:
-            to_pivot = from_lang.get_translation(pivot_lang)
-            from_pivot = pivot_lang.get_translation(to_lang)
+def _translate_uncached(text, source_lang, target_lang):
+    # ✅ Si le modèle direct existe
+    direct = _get_translation(source_lang, target_lang)
+    if direct:
+        return direct.translate(text)
 
-            if to_pivot and from_pivot:
-                intermediate = to_pivot.translate(text)
-                return from_pivot.translate(intermediate)
+    # 🔄 Sinon : passer par l’anglais comme pivot
+    pivot_code = "en"
+    to_pivot = _get_translation(source_lang, pivot_code)
+    from_pivot = _get_translation(pivot_code, target_lang)
+    if to_pivot and from_pivot:
+        intermediate = to_pivot.translate(text)
+        return from_pivot.translate(intermediate)
+
+    return None
+
+
+def translate_with_gemma(text, source_lang, target_lang):
+    try:
+        # 🔁 Évite les traductions inutiles
+        if source_lang == target_lang or not text:
+            return text
+
+        cached = _cache_get(text, source_lang, target_lang)
+        if cached is not None:
+            return cached
+
+        translated = _translate_uncached(text, source_lang, target_lang)
 
         # 🚫 Aucun chemin possible
-        return f"[NO MODEL {source_lang}→{target_lang}] {text}"
+        if translated is None:
+            return f"[NO MODEL {source_lang}→{target_lang}] {text}"
+
+        _cache_put(text, source_lang, target_lang, translated)
+        return translated
 
     except Exception:
         return f"[ERROR] {text}"
+
+
+# === Traduction vers plusieurs langues en parallèle ===
+_executor = ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS, thread_name_prefix="translate")
+
+
+def translate_to_all(text, source_lang, targets=("fr", "en", "ar"), pivot=None):
+    # pivot="fr" : les langues autres que fr sont traduites depuis la version française
+    # (comportement historique des formulaires d'ajout), sinon tout part de la source.
+    results = {source_lang: text}
+
+    if pivot and source_lang != pivot and pivot in targets:
+        first_leg = [pivot]
+    else:
+        first_leg = [t for t in targets if t != source_lang]
+
+    futures = {t: _executor.submit(translate_with_gemma, text, source_lang, t) for t in first_leg}
+    results.update({t: f.result() for t, f in futures.items()})
+
+    remaining = [t for t in targets if t not in results]
+    if remaining:
+        futures = {t: _executor.submit(translate_with_gemma, results[pivot], pivot, t) for t in remaining}
+        results.update({t: f.result() for t, f in futures.items()})
+
+    return results
@@ -0,0 +1,265 @@
+import heapq
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
+from models import db, Category, Response, TranslationJob
+from translate_utils import translate_to_all
+
+# === Traductions en arrière-plan des contenus admin ===
+# Le texte source est enregistré tout de suite (copié dans les autres langues en attendant, voir
+# placeholder_fields), un job est persisté dans la table translation_job puis traité par un thread dédié.
+# Quand la traduction est prête, seuls les champs de la ligne concernée sont mis à jour :
+# le commit déclenche content_events, qui ré-encode uniquement cette ligne.
+# Les jobs pending/running sont repris au redémarrage.
+# Échec : nouvelle tentative après un délai exponentiel (TRANSLATION_RETRY_DELAY * 2^(tentatives-1)),
+# persisté dans next_attempt_at et respecté aussi à la reprise.
+
+ASYNC_TRANSLATION = os.environ.get("CHATBOT_ASYNC_TRANSLATION", "1") not in ("0", "false", "no")
+TRANSLATION_JOB_MAX_ATTEMPTS = int(os.environ.get("CHATBOT_TRANSLATION_JOB_MAX_ATTEMPTS", 3))
+TRANSLATION_JOB_BATCH_SIZE = int(os.environ.get("CHATBOT_TRANSLATION_JOB_BATCH_SIZE", 20))
+TRANSLATION_RETRY_DELAY = float(os.environ.get("CHATBOT_TRANSLATION_RETRY_DELAY", 30))
+
+LANGS = ("fr", "en", "ar")
+TARGET_FIELDS = {"category": (Category, "name_"), "response": (Response, "answer_")}
+ACTIVE_STATUSES = ("pending", "running", "error")
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_delayed = []  # tas (échéance monotonic, job_id) des nouvelles tentatives
+_delayed_lock = threading.Lock()
+
+
+def placeholder_fields(target_type, text):
+    # ⏳ En attendant la traduction, toutes les langues affichent le texte source. Voulu : la navigation,
+    # l'index de recherche et les réponses lisent directement name_<lang> / answer_<lang> ;
+    # des champs vides donneraient des libellés et réponses vides plutôt que le texte d'origine.
+    prefix = TARGET_FIELDS[target_type][1]
+    return {prefix + lang: text for lang in LANGS}
+
+
+def _supersede(target_type, target_ids):
+    return TranslationJob.query.filter(
+        TranslationJob.target_type == target_type,
+        TranslationJob.target_id.in_(list(target_ids)),
+        TranslationJob.status.in_(ACTIVE_STATUSES)
+    ).update({"status": "cancelled", "updated_at": datetime.utcnow()}, synchronize_session=False)
+
+
+def cancel_jobs(target_type, target_id):
+    # ✋ Correction manuelle des traductions : le job en cours ne doit plus l'écraser
+    # (validé par le commit de l'appelant)
+    _supersede(target_type, [target_id])
+
+
+def schedule_translation(target_type, target_id, source_text, source_lang, pivot=None):
+    return schedule_translations([(target_type, target_id, source_text, source_lang, pivot)])[0]
+
+
+def schedule_translations(items):
+    # items : [(target_type, target_id, source_text, source_lang, pivot)] -> un seul commit
+    by_type = {}
+    for target_type, target_id, *_ in items:
+        by_type.setdefault(target_type, set()).add(target_id)
+    for target_type, target_ids in by_type.items():
+        _supersede(target_type, target_ids)
+
+    jobs = [
+        TranslationJob(
+            target_type=target_type,
+            target_id=target_id,
+            source_lang=source_lang,
+            source_text=source_text,
+            pivot_lang=pivot
+        )
+        for target_type, target_id, source_text, source_lang, pivot in items
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+    job_ids = [job.id for job in jobs]
+
+    if ASYNC_TRANSLATION and _worker is not None:
+        for job_id in job_ids:
+            _queue.put(job_id)
+    else:
+        # 🔁 Mode synchrone (désactivé ou worker non démarré) : même traitement, dans la requête
+        process_jobs(job_ids)
+    return job_ids
+
+
+def job_statuses(target_type, target_ids=None):
+    query = TranslationJob.query.filter(
+        TranslationJob.target_type == target_type,
+        TranslationJob.status.in_(ACTIVE_STATUSES)
+    )
+    if target_ids is not None:
+        query = query.filter(TranslationJob.target_id.in_(list(target_ids)))
+    return {job.target_id: job.status for job in query.all()}
+
+
+def _claim(job_id):
+    # 🔒 Passage atomique pending -> running : un job n'est traité qu'une fois
+    claimed = TranslationJob.query.filter_by(id=job_id, status="pending").update(
+        {"status": "running", "attempts": TranslationJob.attempts + 1, "updated_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error
+    db.session.commit()
+
+
+def _translate(job_id):
+    if not _claim(job_id):
+        return None
+    job = db.session.get(TranslationJob, job_id)
+
+    try:
+        translations = translate_to_all(job.source_text, job.source_lang, pivot=job.pivot_lang)
+    except Exception as e:
+        translations = {"error": f"[ERROR] {e}"}
+
+    failed = [value for value in translations.values() if value.startswith(("[ERROR]", "[NO MODEL"))]
+    if failed:
+        if _worker is not None and job.attempts < TRANSLATION_JOB_MAX_ATTEMPTS and not failed[0].startswith("[NO MODEL"):
+            delay = TRANSLATION_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            _finish(job, "pending", failed[0])
+            _retry_later(job.id, delay)
+        else:
+            _finish(job, "error", failed[0])
+        print(f"❌ Traduction {job.target_type}#{job.target_id} échouée :", failed[0])
+        return None
+    return job, translations
+
+
+def _apply(job, translations):
+    model, prefix = TARGET_FIELDS[job.target_type]
+    target = db.session.get(model, job.target_id)
+    db.session.refresh(job)
+    # ⏭️ Ligne supprimée, texte source modifié ou job annulé entre-temps : résultat obsolète
+    if target is None or job.status != "running" or (getattr(target, prefix + job.source_lang) or "").strip() != job.source_text.strip():
+        if job.status == "running":
+            job.status = "cancelled"
+        return
+
+    for lang in LANGS:
+        if lang != job.source_lang:
+            setattr(target, prefix + lang, translations[lang])
+    job.status = "done"
+    job.error = None
+
+
+def process_jobs(job_ids):
+    # 📦 Traductions faites une par une, mais un seul commit pour tout le lot :
+    # content_events ré-encode alors les lignes modifiées en un seul passage
+    results = [result for result in map(_translate, job_ids) if result]
+    for job, translations in results:
+        _apply(job, translations)
+    db.session.commit()
+
+
+def process_job(job_id):
+    process_jobs([job_id])
+
+
+def _retry_later(job_id, delay):
+    with _delayed_lock:
+        heapq.heappush(_delayed, (time.monotonic() + max(0.0, delay), job_id))
+
+
+def _release_due():
+    # Échéances atteintes -> file normale ; renvoie le délai avant la prochaine (None : aucune)
+    with _delayed_lock:
+        now = time.monotonic()
+        while _delayed and _delayed[0][0] <= now:
+            _queue.put(heapq.heappop(_delayed)[1])
+        return _delayed[0][0] - now if _delayed else None
+
+
+def _next_job():
+    while True:
+        timeout = _release_due()
+        try:
+            return _queue.get(timeout=timeout)
+        except queue.Empty:
+            continue
+
+
+def _next_batch():
+    job_ids = [_next_job()]
+    while len(job_ids) < TRANSLATION_JOB_BATCH_SIZE:
+        try:
+            job_ids.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return job_ids
+
+
+def _run(app):
+    with app.app_context():
+        while True:
+            job_ids = _next_batch()
+            try:
+                process_jobs(job_ids)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Jobs de traduction {job_ids} en erreur :", e)
+            finally:
+                db.session.remove()
+                for _ in job_ids:
+                    _queue.task_done()
+
+
+def wait_for_jobs():
+    # ⏳ Bloque jusqu'à ce que la file soit vide, nouvelles tentatives comprises (imports en ligne de commande)
+    if _worker is None:
+        return
+    while True:
+        _queue.join()
+        with _delayed_lock:
+            if not _delayed and not _queue.unfinished_tasks:
+                return
+        time.sleep(0.5)
+
+
+def start_translation_worker(app):
+    global _worker
+    with app.app_context():
+        # Table créée même en mode synchrone : schedule_translations et job_statuses s'en servent
+        TranslationJob.__table__.create(db.engine, checkfirst=True)
+        # Bases existantes : colonne ajoutée avec le backoff des nouvelles tentatives
+        if "next_attempt_at" not in {c["name"] for c in inspect(db.engine).get_columns("translation_job")}:
+            with db.engine.begin() as connection:
+                connection.execute(text("ALTER TABLE translation_job ADD COLUMN next_attempt_at DATETIME"))
+    if not ASYNC_TRANSLATION:
+        return None
+
+    with _worker_lock:
+        if _worker is not None:
+            return _worker
+
+        with app.app_context():
+            # 🔄 Reprise après redémarrage : les jobs interrompus repartent de zéro
+            TranslationJob.query.filter_by(status="running").update({"status": "pending"}, synchronize_session=False)
+            db.session.commit()
+            now = datetime.utcnow()
+            for job_id, next_attempt_at in (
+                db.session.query(TranslationJob.id, TranslationJob.next_attempt_at).filter_by(status="pending").order_by(TranslationJob.id)
+            ):
+                if next_attempt_at and next_attempt_at > now:
+                    _retry_later(job_id, (next_attempt_at - now).total_seconds())
+                else:
+                    _queue.put(job_id)
+            db.session.remove()
+
+        _worker = threading.Thread(target=_run, args=(app,), name="translation-jobs", daemon=True)
+        _worker.start()
+    return _worker